@@ -0,0 +1,123 @@
+"""
+Run-length encoded action logs.
+
+An action log is the buttons pressed on every frame of a run, stored as (buttons, count) runs where buttons is
+the 9 buttons packed into a bitmask (see ram_trace.pack_buttons). It's saved as actions.npz next to the weights
+of an individual. The emulator is deterministic, so stepping an env with the log gives the exact same run without
+the network, perception or inference:
+
+    python action_log.py record "Example world1-1" --inds 1213,1214
+    python action_log.py replay "Example world1-1" --inds 1213,1214
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Iterator, List, Optional, Tuple
+import numpy as np
+
+from ram_trace import pack_buttons, unpack_buttons
+from utils import SMB
+
+
+ACTION_LOG_FILENAME = 'actions.npz'
+
+
+class ActionLog(object):
+    def __init__(self, buttons: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None):
+        self._buttons: List[int] = [] if buttons is None else [int(b) for b in buttons]
+        self._counts: List[int] = [] if counts is None else [int(c) for c in counts]
+
+    def append(self, buttons: np.ndarray) -> None:
+        mask = pack_buttons(buttons)
+        if self._buttons and self._buttons[-1] == mask:
+            self._counts[-1] += 1
+        else:
+            self._buttons.append(mask)
+            self._counts.append(1)
+
+    @property
+    def num_frames(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def num_runs(self) -> int:
+        return len(self._counts)
+
+    def runs(self) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Yields (buttons, count) for each run. The same buttons array is yielded for the whole run
+        """
+        for mask, count in zip(self._buttons, self._counts):
+            yield unpack_buttons(mask), count
+
+    def save(self, individual_dir: str) -> None:
+        np.savez(os.path.join(individual_dir, ACTION_LOG_FILENAME),
+                 buttons=np.array(self._buttons, np.uint16), counts=np.array(self._counts, np.uint32))
+
+    @classmethod
+    def load(cls, individual_dir: str) -> 'ActionLog':
+        fname = os.path.join(individual_dir, ACTION_LOG_FILENAME)
+        if not os.path.exists(fname):
+            raise Exception(f'No {ACTION_LOG_FILENAME} found under {individual_dir}')
+        with np.load(fname) as data:
+            return cls(data['buttons'], data['counts'])
+
+
+def replay_actions(env: Any, action_log: ActionLog) -> Tuple[int, int, bool]:
+    """
+    Step the env through an action log. Returns (frames, farthest_x, did_win).
+    Only the RAM is looked at, so it runs at the speed of the emulator.
+    """
+    env.reset()
+    frames = 0
+    farthest_x = 0
+    did_win = False
+    for buttons, count in action_log.runs():
+        for _ in range(count):
+            env.step(buttons)
+            ram = env.get_ram()
+            farthest_x = max(farthest_x, SMB.get_mario_location_in_level(ram).x)
+            # Sliding down flag pole
+            did_win |= bool(ram[0x001D] == 3)
+        frames += count
+    return frames, farthest_x, did_win
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Record and replay action logs of saved individuals')
+    parser.add_argument('command', choices=('record', 'replay'), help='record runs the network and saves the action log. replay only steps the env with it')
+    parser.add_argument('population', help='Population folder, i.e. "Example world1-1"')
+    parser.add_argument('--inds', dest='inds', default=None, help='Comma separated generations, i.e. 1213,1214. Default is every best_ind_gen* folder')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from config import Config
+    from emulator import make_env
+    from evaluation import run_individual
+    from mario import load_mario
+    from replay import find_individuals
+
+    args = parse_args()
+    config = Config(os.path.join(args.population, 'settings.config'))
+    inds = [int(ind) for ind in args.inds.split(',')] if args.inds else None
+    env = make_env(config.Misc.level, ram_only=True)
+
+    for individual_name in find_individuals(args.population, inds):
+        individual_dir = os.path.join(args.population, individual_name)
+        start = time.time()
+        if args.command == 'record':
+            mario = load_mario(args.population, individual_name, config)
+            run_individual(env, mario, record_actions=True)
+            mario.action_log.save(individual_dir)
+            frames, farthest_x, did_win = mario._frames, mario.farthest_x, mario.did_win
+            extra = f', {mario.action_log.num_runs} runs'
+        else:
+            frames, farthest_x, did_win = replay_actions(env, ActionLog.load(individual_dir))
+            extra = ''
+        elapsed = time.time() - start
+        print(f'{individual_name}: frames {frames}, distance {farthest_x}, win {did_win}{extra} ({frames / elapsed:.0f} frames/s)')
+
+    env.close()
+    sys.exit(0)
@@ -0,0 +1,15 @@
+import os
+from typing import Any, Callable
+
+from benchmarks.common import register, make_config, FIXTURE_DIR
+from evaluation import run_individual
+from mario import Mario
+from ram_trace import TraceEnv
+
+
+@register('run_individual', [{'level': level} for level in ('1-1', '4-1')])
+def setup_run_individual(level: str) -> Callable[[], Any]:
+    # The whole evaluation loop (step, perception, inference) over one episode of a fixture
+    config = make_config()
+    env = TraceEnv(os.path.join(FIXTURE_DIR, f'ram_{level}.npz'))
+    return lambda: run_individual(env, Mario(config))
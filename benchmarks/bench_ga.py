@@ -0,0 +1,159 @@
+from typing import Any, Callable
+import numpy as np
+
+from benchmarks.common import register, make_config
+from es import EvolutionStrategy
+from generation import next_generation, get_next_gen_size
+from genetic_algorithm.population import Population
+from genetic_algorithm.selection import elitism_selection, tournament_selection, roulette_wheel_selection
+from genetic_algorithm.crossover import simulated_binary_crossover, uniform_binary_crossover, single_point_binary_crossover
+from genetic_algorithm.mutation import gaussian_mutation, random_uniform_mutation, cauchy_mutation, exponential_mutation, mmo_mutation
+from genetic_algorithm.operators import CROSSOVERS, MUTATIONS, get_crossover, get_mutation
+from mario import Mario
+
+
+GENOME_PARAMS = [{'genes': genes} for genes in (1000, 10000, 100000)]
+POPULATION_PARAMS = [{'pop': pop} for pop in (100, 1000)]
+
+
+def _evaluated_population(config, size: int) -> Population:
+    individuals = [Mario(config) for _ in range(size)]
+    for individual in individuals:
+        individual._fitness = np.random.uniform(1, 1000)
+        individual.farthest_x = np.random.randint(0, 3000)
+    return Population(individuals)
+
+
+@register('simulated_binary_crossover', GENOME_PARAMS)
+def setup_sbx(genes: int) -> Callable[[], Any]:
+    p1 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    p2 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: simulated_binary_crossover(p1, p2, 100)
+
+
+@register('gaussian_mutation', GENOME_PARAMS)
+def setup_gaussian_mutation(genes: int) -> Callable[[], Any]:
+    chromosome = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: gaussian_mutation(chromosome, 0.05, scale=0.2)
+
+
+@register('uniform_binary_crossover', GENOME_PARAMS)
+def setup_uniform_binary_crossover(genes: int) -> Callable[[], Any]:
+    p1 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    p2 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: uniform_binary_crossover(p1, p2)
+
+
+@register('single_point_binary_crossover', GENOME_PARAMS)
+def setup_single_point_binary_crossover(genes: int) -> Callable[[], Any]:
+    p1 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    p2 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: single_point_binary_crossover(p1, p2)
+
+
+@register('random_uniform_mutation', GENOME_PARAMS)
+def setup_random_uniform_mutation(genes: int) -> Callable[[], Any]:
+    chromosome = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: random_uniform_mutation(chromosome, 0.05, -1, 1)
+
+
+@register('cauchy_mutation', GENOME_PARAMS)
+def setup_cauchy_mutation(genes: int) -> Callable[[], Any]:
+    chromosome = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: cauchy_mutation(chromosome, 0.05, scale=0.2)
+
+
+@register('exponential_mutation', GENOME_PARAMS)
+def setup_exponential_mutation(genes: int) -> Callable[[], Any]:
+    chromosome = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: exponential_mutation(chromosome, 1.0, 0.05)
+
+
+@register('mmo_mutation', GENOME_PARAMS)
+def setup_mmo_mutation(genes: int) -> Callable[[], Any]:
+    chromosome = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: mmo_mutation(chromosome, 0.05)
+
+
+# The in-place kernels from the registry, i.e. what next_generation runs for each crossover_type/mutation_type
+
+@register('crossover_kernel', [{'op': op, **params} for op in CROSSOVERS for params in GENOME_PARAMS])
+def setup_crossover_kernel(op: str, genes: int) -> Callable[[], Any]:
+    kernel = get_crossover(make_config(crossover_type=op))
+    p1 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    p2 = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    out1, out2 = np.empty_like(p1), np.empty_like(p2)
+    return lambda: kernel(p1, p2, out1, out2)
+
+
+@register('mutation_kernel', [{'op': op, **params} for op in MUTATIONS for params in GENOME_PARAMS])
+def setup_mutation_kernel(op: str, genes: int) -> Callable[[], Any]:
+    kernel = get_mutation(make_config(mutation_type=op))
+    chromosome = np.random.uniform(-1, 1, size=(genes // 10, 10))
+    return lambda: kernel(chromosome, 0.05)
+
+
+@register('elitism_selection', POPULATION_PARAMS)
+def setup_elitism_selection(pop: int) -> Callable[[], Any]:
+    population = _evaluated_population(make_config(), pop)
+    return lambda: elitism_selection(population, pop // 10)
+
+
+@register('roulette_wheel_selection', POPULATION_PARAMS)
+def setup_roulette_wheel_selection(pop: int) -> Callable[[], Any]:
+    population = _evaluated_population(make_config(), pop)
+    return lambda: roulette_wheel_selection(population, 2)
+
+
+@register('tournament_selection', POPULATION_PARAMS)
+def setup_tournament_selection(pop: int) -> Callable[[], Any]:
+    population = _evaluated_population(make_config(), pop)
+    return lambda: tournament_selection(population, 2, 5)
+
+
+@register('next_generation', [
+    {'parents': 10, 'offspring': 90, 'hidden': '(9)'},
+    {'parents': 10, 'offspring': 90, 'hidden': '(32, 16)'},
+    {'parents': 50, 'offspring': 500, 'hidden': '(9)'},
+    {'parents': 200, 'offspring': 1000, 'hidden': '(9)'},
+])
+def setup_next_generation(parents: int, offspring: int, hidden: str) -> Callable[[], Any]:
+    config = make_config(num_parents=parents, num_offspring=offspring, hidden_layer_architecture=hidden)
+    population = _evaluated_population(config, get_next_gen_size(config))
+    evaluated = list(population.individuals)
+
+    def fn():
+        # next_generation replaces the individuals with the elite parents, so restore the evaluated ones first
+        population.individuals = list(evaluated)
+        next_generation(population, config, 1)
+    return fn
+
+
+@register('es_next_generation', [
+    {'pop': 100, 'hidden': '(9)'},
+    {'pop': 100, 'hidden': '(32, 16)'},
+    {'pop': 1000, 'hidden': '(9)'},
+])
+def setup_es_next_generation(pop: int, hidden: str) -> Callable[[], Any]:
+    config = make_config(optimizer='es', population_size=pop, hidden_layer_architecture=hidden)
+    es = EvolutionStrategy(config)
+    population = _evaluated_population(config, config.Selection.num_parents)
+    # The first call picks the starting mean, after that every call is an update from an asked population
+    population.individuals = es.next_generation(population, 1)
+    for individual in population.individuals:
+        individual._fitness = np.random.uniform(1, 1000)
+    evaluated = list(population.individuals)
+
+    def fn():
+        population.individuals = list(evaluated)
+        es._asked = evaluated
+        es.next_generation(population, 1)
+    return fn
+
+
+@register('construct_mario', [{'chromosome': chromosome} for chromosome in (False, True)])
+def setup_construct_mario(chromosome: bool) -> Callable[[], Any]:
+    # next_generation creates every child from a chromosome, only the first generation is random
+    config = make_config()
+    params = Mario(config).network.params if chromosome else None
+    return lambda: Mario(config, params)
@@ -0,0 +1,46 @@
+import itertools
+from typing import Any, Callable
+
+from benchmarks.common import register, load_fixtures, make_config
+from evaluation import OUTPUT_TO_KEYS_MAP
+from mario import Mario
+from utils import SMB
+
+
+NETWORK_PARAMS = [
+    {'input_dims': '(4, 7, 10)', 'hidden': '(9)'},
+    {'input_dims': '(4, 7, 10)', 'hidden': '(12, 9)'},
+    {'input_dims': '(2, 16, 13)', 'hidden': '(32, 16)'},
+    # Large enough for the sparse first layer
+    {'input_dims': '(0, 16, 15)', 'hidden': '(128)'},
+    {'input_dims': '(0, 16, 15)', 'hidden': '(512)'},
+]
+
+
+@register('feed_forward', NETWORK_PARAMS)
+def setup_feed_forward(input_dims: str, hidden: str) -> Callable[[], Any]:
+    config = make_config(input_dims=input_dims, hidden_layer_architecture=hidden)
+    mario = Mario(config)
+    # Use real encoded inputs from the fixtures so the network sees the same sparsity it would in a run
+    inputs = []
+    for ram in load_fixtures()['1-1']:
+        mario.set_input_as_array(ram, SMB.get_tiles(ram))
+        inputs.append(mario.inputs_as_array.copy())
+    inputs = itertools.cycle(inputs)
+    network = mario.network
+    return lambda: network.feed_forward(next(inputs))
+
+
+@register('mario_update', [{'forward_memo_size': size} for size in (0, 8)])
+def setup_mario_update(forward_memo_size: int) -> Callable[[], Any]:
+    # Perception is done up front so only the input encoding, inference (or memo lookup) and buttons are timed
+    config = make_config(forward_memo_size=forward_memo_size)
+    mario = Mario(config)
+    frames = itertools.cycle([(ram, SMB.get_tiles(ram)) for ram in load_fixtures()['1-1']])
+
+    def update():
+        ram, tiles = next(frames)
+        mario.update(ram, tiles, None, OUTPUT_TO_KEYS_MAP)
+        # Keep it alive, stalling would end the run
+        mario._frames_since_progress = 0
+    return update
@@ -0,0 +1,37 @@
+import itertools
+from typing import Any, Callable
+
+from benchmarks.common import register, load_fixtures, make_config
+from mario import Mario
+from utils import SMB
+
+
+LEVEL_PARAMS = [{'level': level} for level in ('1-1', '2-1', '4-1', '8-1')]
+
+
+def _frames(level: str):
+    return itertools.cycle(list(load_fixtures()[level]))
+
+
+@register('get_tiles', LEVEL_PARAMS)
+def setup_get_tiles(level: str) -> Callable[[], Any]:
+    frames = _frames(level)
+    return lambda: SMB.get_tiles(next(frames))
+
+
+@register('get_enemy_locations', LEVEL_PARAMS)
+def setup_get_enemy_locations(level: str) -> Callable[[], Any]:
+    frames = _frames(level)
+    return lambda: SMB.get_enemy_locations(next(frames))
+
+
+@register('set_input_as_array', LEVEL_PARAMS)
+def setup_set_input_as_array(level: str) -> Callable[[], Any]:
+    mario = Mario(make_config())
+    # Tiles are precomputed so only the encoding is timed
+    frames = itertools.cycle([(ram, SMB.get_tiles(ram)) for ram in load_fixtures()[level]])
+
+    def fn():
+        ram, tiles = next(frames)
+        mario.set_input_as_array(ram, tiles)
+    return fn
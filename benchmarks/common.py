@@ -0,0 +1,102 @@
+import os
+import re
+import tempfile
+import timeit
+from collections import namedtuple
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+from config import Config
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+DEFAULT_CONFIG = os.path.join(REPO_DIR, 'settings.config')
+
+# A benchmark is a name, the parameters it is ran with and a setup function.
+# The setup function takes the parameters as keyword arguments and returns the zero argument callable that gets timed.
+Benchmark = namedtuple('Benchmark', ['name', 'params', 'setup'])
+_benchmarks: List[Benchmark] = []
+
+
+def register(name: str, params: Optional[List[Dict[str, Any]]] = None) -> Callable:
+    """
+    Register a setup function as a benchmark once for every set of params
+    """
+    def decorator(setup: Callable[..., Callable[[], Any]]) -> Callable[..., Callable[[], Any]]:
+        for p in (params or [{}]):
+            _benchmarks.append(Benchmark(name, p, setup))
+        return setup
+    return decorator
+
+
+def get_benchmarks() -> List[Benchmark]:
+    return list(_benchmarks)
+
+
+def benchmark_key(name: str, params: Dict[str, Any]) -> str:
+    """
+    Unique key used to compare results against a baseline, i.e. 'next_generation[genome=1000,pop=100]'
+    """
+    if not params:
+        return name
+    return '{}[{}]'.format(name, ','.join('{}={}'.format(k, params[k]) for k in sorted(params)))
+
+
+def time_callable(fn: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """
+    Time fn and return the per call time in seconds.
+    The number of calls per measurement is chosen so each measurement takes at least min_time.
+    """
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'min': float(min(times)),
+        'median': float(np.median(times)),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def load_fixtures() -> Dict[str, np.ndarray]:
+    """
+    Load all RAM fixtures. Returns a mapping of level -> (num_frames, 2048) uint8 RAM snapshots
+    """
+    fixtures = {}
+    for fname in sorted(os.listdir(FIXTURE_DIR)):
+        if fname.endswith('.npz'):
+            with np.load(os.path.join(FIXTURE_DIR, fname)) as data:
+                fixtures[str(data['level'])] = data['ram']
+    if not fixtures:
+        raise Exception(f'No RAM fixtures found under {FIXTURE_DIR}. Run "python -m benchmarks.make_fixtures"')
+    return fixtures
+
+
+def make_config(**overrides: Any) -> Config:
+    """
+    Create a Config from settings.config with some values overridden, i.e. make_config(hidden_layer_architecture='(12, 9)').
+    Config only reads from files, so the result is written to a temp file first.
+    """
+    with open(DEFAULT_CONFIG) as f:
+        text = f.read()
+
+    for key, value in overrides.items():
+        text, num_subs = re.subn(r'^{}\s*=.*$'.format(key), '{} = {}'.format(key, value), text, flags=re.MULTILINE)
+        if num_subs != 1:
+            raise Exception(f'Unable to override "{key}" in {DEFAULT_CONFIG}')
+
+    fd, path = tempfile.mkstemp(suffix='.config')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        return Config(path)
+    finally:
+        os.remove(path)
@@ -0,0 +1,109 @@
+"""
+Compare the GA and the ES optimizer by the total number of frames emulated until the first individual beats the level.
+
+Usage (from the repository root):
+    python -m benchmarks.compare_optimizers --level 1-1 --seeds 0 1 2 --max-frames 20000000
+    python -m benchmarks.compare_optimizers --trace traces/1-1.npz --max-frames 100000     # Smoke test without the emulator
+
+Both optimizers start from settings.config with only [GeneticAlgorithm] optimizer changed. A run that reaches
+--max-frames without a win counts as not finished. This needs the emulator unless --trace is given, and a trace
+can only finish if it contains a win since it doesn't react to the buttons pressed.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from benchmarks.common import make_config
+from config import Config
+from emulator import make_env
+from es import EvolutionStrategy
+from evaluation import run_individual
+from generation import next_generation
+from genetic_algorithm.population import Population
+from mario import Mario
+from ram_trace import TraceEnv
+
+
+OPTIMIZERS = ('ga', 'es')
+
+
+def frames_to_first_win(config: Config, env: Any, max_frames: int, seed: int) -> Dict[str, Any]:
+    """
+    Train from scratch and return the frames and generations it took until the first win.
+    frames is None if nothing won within max_frames.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    es = EvolutionStrategy.from_config(config)
+    population = Population([Mario(config) for _ in range(config.Selection.num_parents)])
+    total_frames = 0
+    generation = 0
+    start = time.time()
+    while True:
+        for individual in population.individuals:
+            run_individual(env, individual)
+            total_frames += individual._frames
+            if individual.did_win:
+                return {'frames': total_frames, 'generations': generation, 'seconds': time.time() - start}
+            if total_frames >= max_frames:
+                return {'frames': None, 'generations': generation, 'seconds': time.time() - start}
+
+        generation += 1
+        if es:
+            population.individuals = es.next_generation(population, generation)
+        else:
+            population.individuals = next_generation(population, config, generation)
+
+
+def compare_optimizers(level: str, seeds: List[int], max_frames: int, trace: Optional[str] = None) -> Dict[str, Any]:
+    env = TraceEnv(trace) if trace else make_env(level, ram_only=True)
+    results: Dict[str, Any] = {}
+    try:
+        for optimizer in OPTIMIZERS:
+            config = make_config(optimizer=optimizer, level=level)
+            runs = []
+            for seed in seeds:
+                run = frames_to_first_win(config, env, max_frames, seed)
+                run['seed'] = seed
+                frames = f'{run["frames"]} frames' if run['frames'] is not None else 'no win'
+                print(f'{optimizer} seed {seed}: {frames}, {run["generations"]} generations, {run["seconds"]:.1f}s')
+                sys.stdout.flush()
+                runs.append(run)
+            finished = [run['frames'] for run in runs if run['frames'] is not None]
+            results[optimizer] = {
+                'runs': runs,
+                'num_finished': len(finished),
+                'median_frames': float(np.median(finished)) if finished else None,
+            }
+    finally:
+        env.close()
+    return {'level': level, 'max_frames': max_frames, 'results': results}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Frames to the first win of the GA vs the ES optimizer')
+    parser.add_argument('--level', dest='level', default='1-1', help='Level to beat')
+    parser.add_argument('--seeds', dest='seeds', type=int, nargs='+', default=[0, 1, 2], help='One run per optimizer for each seed')
+    parser.add_argument('--max-frames', dest='max_frames', type=int, default=20000000, help='Give up on a run after this many frames')
+    parser.add_argument('--trace', dest='trace', default=None, help='Evaluate on a RAM trace instead of the emulator')
+    parser.add_argument('--output', dest='output', default=None, help='Write the results as JSON to this file')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = compare_optimizers(args.level, args.seeds, args.max_frames, args.trace)
+
+    print('\n{:<10} {:>10} {:>16}'.format('Optimizer', 'Finished', 'Median frames'))
+    for optimizer, result in results['results'].items():
+        median = result['median_frames']
+        print('{:<10} {:>10} {:>16}'.format(optimizer, '{}/{}'.format(result['num_finished'], len(args.seeds)),
+                                           '-' if median is None else '{:.0f}'.format(median)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,166 @@
+"""
+Create the RAM fixtures used by the benchmarks.
+
+There are two ways of creating fixtures:
+  --record     Run each level in the emulator with a right-biased random policy and keep RAM snapshots.
+               This needs gym-retro and the ROM.
+  --synthetic  Build snapshots from a generated level layout. The tile pages, Mario/enemy positions and score
+               are written to the same RAM locations the game uses, so perception code takes the same paths.
+
+The checked in fixtures were created with --synthetic. Re-record them with --record on a machine with the ROM.
+"""
+import argparse
+import os
+from typing import List
+import numpy as np
+
+from benchmarks.common import FIXTURE_DIR
+from utils import SMB
+
+
+LEVELS = ['1-1', '2-1', '4-1', '8-1']
+
+
+def _build_level(rng: np.random.RandomState, num_cols: int) -> np.ndarray:
+    """
+    Generate a (13, num_cols) level of tile values in the same layout as the RAM tile pages
+    """
+    level = np.zeros((13, num_cols), np.uint8)
+    level[11:, :] = 0x54  # Ground
+    col = 20
+    while col < num_cols - 8:
+        feature = rng.randint(5)
+        if feature == 0:  # Hole
+            width = rng.randint(2, 4)
+            level[11:, col:col+width] = 0x00
+            col += width
+        elif feature == 1:  # Pipe
+            height = rng.randint(2, 5)
+            top = 11 - height
+            level[top, col:col+2] = (0x12, 0x13)
+            level[top+1:11, col:col+2] = (0x14, 0x15)
+            col += 2
+        elif feature == 2:  # Row of blocks
+            width = rng.randint(1, 6)
+            level[7, col:col+width] = rng.choice([0x51, 0xC0, 0xC1], size=width)
+            col += width
+        elif feature == 3:  # Stairs
+            height = rng.randint(2, 5)
+            for h in range(height):
+                level[10-h:11, col+h] = 0x61
+            col += height
+        col += rng.randint(3, 10)
+    return level
+
+
+def _write_tiles(ram: np.ndarray, level: np.ndarray, screen_x: int) -> None:
+    # The tile pages hold the current screen and the next one (2 pages of 13 rows x 16 cols)
+    ram[0x500:0x500 + SMB.NUM_TILES] = 0
+    start_col = screen_x // 16
+    for c in range(start_col, min(start_col + 32, level.shape[1])):
+        page = (c // 16) % 2
+        addr = 0x500 + page*208 + (c % 16)
+        ram[addr:addr + 13*16:16] = level[:, c]
+
+
+def synthetic_level_ram(level_name: str, num_frames: int, seed: int) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    level = _build_level(rng, 256)
+    rams = np.zeros((num_frames, SMB.TOTAL_RAM), np.uint8)
+
+    mario_x = 40
+    mario_y = 176
+    vel_y = 0
+    score = 0
+    enemy_xs = sorted(rng.randint(300, level.shape[1]*16 - 64, size=12).tolist())
+    for frame in range(num_frames):
+        ram = rams[frame]
+        # Move right in bursts with the occasional stall and jump
+        if rng.rand() < 0.85:
+            mario_x += rng.randint(1, 4)
+        if mario_y == 176 and rng.rand() < 0.08:
+            vel_y = -8
+        mario_y = min(176, mario_y + vel_y)
+        vel_y = vel_y + 1 if mario_y < 176 else 0
+
+        screen_offset = min(mario_x, 112)
+        screen_x = mario_x - screen_offset
+        _write_tiles(ram, level, screen_x)
+
+        ram[SMB.RAMLocations.Player_X_Postion_In_Level.value] = mario_x // 256
+        ram[SMB.RAMLocations.Player_X_Position_On_Screen.value] = mario_x % 256
+        ram[SMB.RAMLocations.Player_X_Position_Screen_Offset.value] = screen_offset
+        ram[SMB.RAMLocations.Player_Y_Position_Screen_Offset.value] = mario_y
+        ram[SMB.RAMLocations.Player_Y_Pos_On_Screen.value] = mario_y
+        ram[SMB.RAMLocations.Player_Vertical_Screen_Position.value] = 1
+        ram[0x0E] = 0x08  # Normal player state
+        ram[0x1D] = 0 if mario_y == 176 else 1
+
+        # Enemies that are on screen get drawn
+        on_screen = [ex for ex in enemy_xs if screen_x <= ex < screen_x + 256][:SMB.MAX_NUM_ENEMIES]
+        for i, ex in enumerate(on_screen):
+            ex -= frame % 64  # Walk left
+            ram[SMB.RAMLocations.Enemy_Drawn.value + i] = 1
+            ram[SMB.RAMLocations.Enemy_Type.value + i] = 0x06
+            ram[SMB.RAMLocations.Enemy_X_Position_In_Level.value + i] = ex // 256
+            ram[SMB.RAMLocations.Enemy_X_Position_On_Screen.value + i] = ex % 256
+            ram[SMB.RAMLocations.Enemy_Y_Position_On_Screen.value + i] = 184
+
+        # Score digits
+        if rng.rand() < 0.05:
+            score += 100
+        digits = [int(d) for d in '{:06d}'.format(score // 10)]
+        ram[0x07D7:0x07DD] = digits
+
+    return rams
+
+
+def record_level_ram(level_name: str, num_frames: int, stride: int, seed: int) -> np.ndarray:
+    from emulator import make_env
+
+    rng = np.random.RandomState(seed)
+    env = make_env(level_name, ram_only=True)
+    ram = env.reset()
+    rams: List[np.ndarray] = []
+    buttons = np.zeros(9, np.int8)
+    frame = 0
+    while len(rams) < num_frames:
+        # Hold right and randomly press A (jump) and B (run)
+        buttons[7] = 1
+        buttons[8] = rng.rand() < 0.3
+        buttons[0] = rng.rand() < 0.5
+        ram, _, done, _ = env.step(buttons)
+        if frame % stride == 0:
+            rams.append(ram.copy())
+        if done or ram[0x0E] in (0x0B, 0x06) or ram[0xB5] == 2:
+            ram = env.reset()
+        frame += 1
+    env.close()
+    return np.stack(rams)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Create RAM fixtures for the benchmarks')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--record', dest='record', action='store_true', help='Record RAM from the emulator (needs gym-retro and the ROM)')
+    group.add_argument('--synthetic', dest='synthetic', action='store_true', help='Build RAM from generated level layouts')
+    parser.add_argument('--levels', dest='levels', default=','.join(LEVELS), help='Comma separated levels to create fixtures for')
+    parser.add_argument('--num-frames', dest='num_frames', type=int, default=64, help='Number of RAM snapshots per level')
+    parser.add_argument('--stride', dest='stride', type=int, default=8, help='When recording, keep every Nth frame')
+    parser.add_argument('--seed', dest='seed', type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if not os.path.exists(FIXTURE_DIR):
+        os.makedirs(FIXTURE_DIR)
+
+    for i, level_name in enumerate(args.levels.split(',')):
+        if args.record:
+            ram = record_level_ram(level_name, args.num_frames, args.stride, args.seed + i)
+        else:
+            ram = synthetic_level_ram(level_name, args.num_frames, args.seed + i)
+        fname = os.path.join(FIXTURE_DIR, f'ram_{level_name}.npz')
+        np.savez_compressed(fname, ram=ram, level=level_name, source='record' if args.record else 'synthetic')
+        print(f'Wrote {ram.shape[0]} RAM snapshots to {fname}')
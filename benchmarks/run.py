@@ -0,0 +1,119 @@
+"""
+Run the hot-path benchmarks.
+
+Usage (from the repository root):
+    python -m benchmarks.run                            # Run everything and compare against benchmarks/baseline.json
+    python -m benchmarks.run --filter get_tiles         # Only run benchmarks whose name contains 'get_tiles'
+    python -m benchmarks.run --output results.json      # Also write the results
+    python -m benchmarks.run --no-baseline              # Just time, don't compare
+    python -m benchmarks.run --save-baseline            # Store the results as the new baseline
+
+Timings depend on the machine, so no baseline is checked in. Create (or refresh after an intended change) the one
+for your machine with --save-baseline before comparing.
+
+Neither the ROM nor gym-retro are needed. RAM comes from the fixtures under benchmarks/fixtures.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from typing import Any, Dict, List
+import numpy as np
+
+from benchmarks.common import BENCHMARK_DIR, get_benchmarks, benchmark_key, time_callable
+# Importing the modules registers their benchmarks
+from benchmarks import bench_perception, bench_network, bench_ga, bench_evaluation  # noqa: F401
+
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+
+def run_benchmarks(name_filter: str = None, repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    for bench in get_benchmarks():
+        if name_filter and name_filter not in bench.name:
+            continue
+        key = benchmark_key(bench.name, bench.params)
+        np.random.seed(0)
+        fn = bench.setup(**bench.params)
+        timing = time_callable(fn, repeat=repeat, min_time=min_time)
+        print('{:<70} {:>12.2f} us'.format(key, timing['min'] * 1e6))
+        sys.stdout.flush()
+        results.append({'key': key, 'name': bench.name, 'params': bench.params, **timing})
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'results': results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> int:
+    """
+    Print how each result compares to the baseline. Returns the number of regressions.
+    Only the min time is compared since it's the least noisy.
+    """
+    baseline_times = {r['key']: r['min'] for r in baseline['results']}
+    num_regressions = 0
+    print('\n{:<70} {:>10} {:>10}'.format('Benchmark', 'Ratio', 'Status'))
+    for result in results['results']:
+        key = result['key']
+        if key not in baseline_times:
+            print('{:<70} {:>10} {:>10}'.format(key, '-', 'new'))
+            continue
+        ratio = result['min'] / baseline_times[key]
+        if ratio > 1 + tolerance:
+            status = 'SLOWER'
+            num_regressions += 1
+        elif ratio < 1 - tolerance:
+            status = 'faster'
+        else:
+            status = 'same'
+        result['baseline_ratio'] = ratio
+        print('{:<70} {:>10.2f} {:>10}'.format(key, ratio, status))
+    return num_regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Super Mario Bros AI hot-path benchmarks')
+    parser.add_argument('--filter', dest='filter', default=None, help='Only run benchmarks whose name contains this')
+    parser.add_argument('--output', dest='output', default=None, help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', dest='baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', dest='save_baseline', default=False, action='store_true', help='Write the results to --baseline')
+    parser.add_argument('--no-baseline', dest='no_baseline', default=False, action='store_true', help="Don't compare against --baseline")
+    parser.add_argument('--tolerance', dest='tolerance', type=float, default=0.2, help='Relative change before something counts as slower/faster')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5, help='Number of measurements per benchmark')
+    parser.add_argument('--min-time', dest='min_time', type=float, default=0.2, help='Minimum seconds per measurement')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    compare_baseline = not args.save_baseline and not args.no_baseline
+    # Check before spending minutes on the benchmarks
+    if compare_baseline and not os.path.exists(args.baseline):
+        raise Exception(f'No baseline at {args.baseline}. Create it on this machine with '
+                        f'"python -m benchmarks.run --baseline {args.baseline} --save-baseline" or pass --no-baseline')
+    results = run_benchmarks(args.filter, args.repeat, args.min_time)
+
+    num_regressions = 0
+    if compare_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        num_regressions = compare(results, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Saved baseline to {args.baseline}')
+
+    sys.exit(1 if num_regressions else 0)
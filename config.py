@@ -24,15 +24,18 @@ _params = {
         'hidden_node_activation': str,
         'output_node_activation': str,
         'encode_row': bool,
+        'forward_memo_size': int,
     },
 
     # Genetic Algorithm
     'GeneticAlgorithm': {
-        'fitness_func': type(lambda : None)
+        'fitness_func': type(lambda : None),
+        'optimizer': str,
     },
 
     # Crossover Params
     'Crossover': {
+        'crossover_type': str,
         'probability_sbx': float,
         'sbx_eta': float,
         'crossover_selection': str,
@@ -42,6 +45,7 @@ _params = {
     # Mutation Params
     'Mutation': {
         'mutation_rate': float,
+        'mutation_type': str,
         'mutation_rate_type': str,
         'gaussian_mutation_scale': float,
     },
@@ -58,7 +62,158 @@ _params = {
     'Misc': {
         'level': str,
         'allow_additional_time_for_flagpole': bool
-    }
+    },
+
+    # Evolution Strategy Params
+    'EvolutionStrategy': {
+        'population_size': int,
+        'sigma': float,
+        'learning_rate': float,
+        'weight_decay': float,
+        'beta1': float,
+        'beta2': float,
+    },
+
+    # Steady-State GA Params
+    'SteadyState': {
+        'enabled': bool,
+    },
+
+    # Death Map Params
+    'DeathMap': {
+        'enabled': bool,
+        'file': str,
+        'bin_size': int,
+    },
+
+    # Trajectory Recording Params
+    'Trajectories': {
+        'enabled': bool,
+        'folder': str,
+        'max_memory_mb': float,
+    },
+
+    # Successive Halving Params
+    'Racing': {
+        'enabled': bool,
+        'budgets': (tuple, int),
+        'keep_fraction': float,
+    },
+
+    # Surrogate Pre-Screening Params
+    'Surrogate': {
+        'enabled': bool,
+        'features': str,
+        'evaluate_fraction': float,
+        'audit_fraction': float,
+        'min_history': int,
+        'history_size': int,
+        'ridge_alpha': float,
+        'num_probes': int,
+    },
+
+    # Novelty Search Params
+    'Novelty': {
+        'mode': str,
+        'descriptor': str,
+        'k': int,
+        'archive_size': int,
+        'add_probability': float,
+        'novelty_weight': float,
+        'trajectory_points': int,
+        'trajectory_interval': int,
+        'cell_size': float,
+    },
+
+    # Multi-Level Params
+    'MultiLevel': {
+        'levels': (tuple, str),
+        'level_weights': (tuple, float),
+        'reducer': str,
+    },
+
+    # Island Model Params
+    'Islands': {
+        'num_islands': int,
+        'topology': str,
+        'migration_interval': int,
+        'num_migrants': int,
+    },
+}
+
+# Default values for params that older config files may not have.
+# These go through the same type conversion as values read from the file.
+_defaults = {
+    'NeuralNetwork': {
+        'forward_memo_size': '8',
+    },
+    'Crossover': {
+        'crossover_type': 'sbx',
+    },
+    'Mutation': {
+        'mutation_type': 'gaussian',
+    },
+    'GeneticAlgorithm': {
+        'optimizer': 'ga',
+    },
+    'EvolutionStrategy': {
+        'population_size': '100',
+        'sigma': '0.05',
+        'learning_rate': '0.02',
+        'weight_decay': '0.005',
+        'beta1': '0.9',
+        'beta2': '0.999',
+    },
+    'SteadyState': {
+        'enabled': 'False',
+    },
+    'DeathMap': {
+        'enabled': 'False',
+        'file': '',
+        'bin_size': '16',
+    },
+    'Trajectories': {
+        'enabled': 'False',
+        'folder': '',
+        'max_memory_mb': '64',
+    },
+    'Racing': {
+        'enabled': 'False',
+        'budgets': '(120, 480)',
+        'keep_fraction': '0.5',
+    },
+    'Surrogate': {
+        'enabled': 'False',
+        'features': 'probe',
+        'evaluate_fraction': '0.25',
+        'audit_fraction': '0.05',
+        'min_history': '200',
+        'history_size': '5000',
+        'ridge_alpha': '1.0',
+        'num_probes': '32',
+    },
+    'Novelty': {
+        'mode': 'off',
+        'descriptor': 'trajectory',
+        'k': '15',
+        'archive_size': '100000',
+        'add_probability': '0.05',
+        'novelty_weight': '0.5',
+        'trajectory_points': '10',
+        'trajectory_interval': '60',
+        'cell_size': '16',
+    },
+    'MultiLevel': {
+        'levels': '',
+        'level_weights': '1.0',
+        'reducer': 'mean',
+    },
+    'Islands': {
+        'num_islands': '1',
+        'topology': 'ring',
+        'migration_interval': '10',
+        'num_migrants': '2',
+    },
 }
 
 class DotNotation(object):
@@ -114,8 +269,12 @@ class Config(object):
 
     def _create_dict_from_config(self) -> None:
         d = {}
+        for section in _defaults:
+            d[section] = dict(_defaults[section])
+
         for section in self._config.sections():
-            d[section] = {}
+            if section not in d:
+                d[section] = {}
             for k, v in self._config[section].items():
                 d[section][k] = v
 
@@ -0,0 +1,172 @@
+"""
+Where and why individuals stop, per level.
+
+Mario.update ends a run when Mario gets killed, falls into a hole, stalls for 3 seconds, reaches the flag or runs
+out of the additional time after a win (see mario.DEATH_CAUSES). With [DeathMap] enabled = True the x position
+of every run's end is accumulated into fixed-size (cause, x bin) histograms for each level, both as the number of
+runs and the number of frames those runs took. Stalls are binned at the farthest x, since that's where the
+obstacle is, everything else at the x Mario ended at.
+
+Each generation is one np.bincount per level and the histograms are saved to [DeathMap] file after every
+generation. A run that is resumed with the same file keeps adding to it. To see where the frames go:
+
+    python death_map.py /path/to/deaths.npz --top 10
+"""
+import argparse
+import os
+from typing import Dict, List, Optional
+import numpy as np
+
+from config import Config
+from evaluation import RESULT_FIELDS, get_result
+from mario import Mario, DEATH_CAUSES, CAUSE_STALL
+
+
+# x in the level is a 16 bit value
+MAX_X = 2**16
+HEAT_CHARS = ' .:-=+*#%@'
+
+_FRAMES = RESULT_FIELDS.index('frames')
+_DISTANCE = RESULT_FIELDS.index('distance')
+_FARTHEST_X = RESULT_FIELDS.index('farthest_x')
+_DEATH_CAUSE = RESULT_FIELDS.index('death_cause')
+
+
+class DeathMap(object):
+    def __init__(self, fname: Optional[str] = None, bin_size: int = 16):
+        """
+        If fname exists the histograms in it are loaded and added to
+        """
+        if bin_size <= 0:
+            raise Exception('[DeathMap] bin_size must be positive')
+        self.fname = fname
+        self.bin_size = bin_size
+        self.num_bins = -(-MAX_X // bin_size)
+        # (len(DEATH_CAUSES), num_bins) per level
+        self.runs: Dict[str, np.ndarray] = {}
+        self.frames: Dict[str, np.ndarray] = {}
+        if fname and os.path.exists(fname):
+            self._load(fname)
+
+    @classmethod
+    def from_config(cls, config: Config, fname: Optional[str] = None) -> Optional['DeathMap']:
+        """
+        None when the death map is disabled. fname is used instead of [DeathMap] file if given
+        """
+        if not config.DeathMap.enabled:
+            return None
+        if not config.DeathMap.file:
+            raise Exception('[DeathMap] file must be set')
+        return cls(fname or config.DeathMap.file, config.DeathMap.bin_size)
+
+    def _get_level(self, level: str) -> None:
+        if level not in self.runs:
+            shape = (len(DEATH_CAUSES), self.num_bins)
+            self.runs[level] = np.zeros(shape, np.int64)
+            self.frames[level] = np.zeros(shape, np.int64)
+
+    def add_results(self, level: str, results: np.ndarray) -> None:
+        """
+        Add (num_runs, len(RESULT_FIELDS)) results, i.e. from evaluation.get_result, of runs on level
+        """
+        if len(results) == 0:
+            return
+        self._get_level(level)
+        causes = results[:, _DEATH_CAUSE].astype(np.intp)
+        x = np.where(causes == CAUSE_STALL, results[:, _FARTHEST_X], results[:, _DISTANCE])
+        bins = np.minimum(x.astype(np.intp) // self.bin_size, self.num_bins - 1)
+        flat = causes * self.num_bins + bins
+        size = len(DEATH_CAUSES) * self.num_bins
+        self.runs[level] += np.bincount(flat, minlength=size).reshape(self.runs[level].shape)
+        frames = np.bincount(flat, weights=results[:, _FRAMES], minlength=size)
+        self.frames[level] += frames.astype(np.int64).reshape(self.frames[level].shape)
+
+    def add(self, level: str, individuals: List[Mario]) -> None:
+        """
+        Add individuals that were evaluated on level
+        """
+        if individuals:
+            self.add_results(level, np.stack([get_result(individual) for individual in individuals]))
+
+    def save(self, fname: Optional[str] = None) -> None:
+        fname = fname or self.fname
+        levels = sorted(self.runs)
+        shape = (len(levels), len(DEATH_CAUSES), self.num_bins)
+        folder = os.path.dirname(fname)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Write next to it and swap so a run that is killed mid write doesn't lose the histograms
+        tmp_fname = fname + '.tmp.npz'
+        np.savez_compressed(tmp_fname, bin_size=self.bin_size, causes=np.array(DEATH_CAUSES), levels=np.array(levels),
+                            runs=np.stack([self.runs[level] for level in levels]) if levels else np.zeros(shape, np.int64),
+                            frames=np.stack([self.frames[level] for level in levels]) if levels else np.zeros(shape, np.int64))
+        os.replace(tmp_fname, fname)
+
+    def _load(self, fname: str) -> None:
+        with np.load(fname) as data:
+            if int(data['bin_size']) != self.bin_size:
+                raise Exception(f'{fname} has a bin_size of {int(data["bin_size"])}, not {self.bin_size}')
+            if tuple(data['causes']) != DEATH_CAUSES:
+                raise Exception(f'{fname} has the causes {tuple(data["causes"])}, not {DEATH_CAUSES}')
+            for i, level in enumerate(data['levels']):
+                self.runs[str(level)] = data['runs'][i]
+                self.frames[str(level)] = data['frames'][i]
+
+    @classmethod
+    def load(cls, fname: str) -> 'DeathMap':
+        with np.load(fname) as data:
+            bin_size = int(data['bin_size'])
+        return cls(fname, bin_size)
+
+    def report(self, top: int = 10, sort: str = 'frames', width: int = 64, levels: Optional[List[str]] = None) -> str:
+        """
+        Totals per cause, a heat strip of the frames over x and the top x bins by frames or runs for each level
+        """
+        if sort not in ('frames', 'runs'):
+            raise Exception(f'Unknown sort "{sort}". Options are (frames, runs)')
+        lines = []
+        for level in levels or sorted(self.runs):
+            if level not in self.runs:
+                raise Exception(f'No runs recorded on level {level}')
+            runs, frames = self.runs[level], self.frames[level]
+            total_runs, total_frames = int(runs.sum()), int(frames.sum())
+            lines.append(f'Level {level}: {total_runs} runs, {total_frames} frames')
+            if total_runs == 0:
+                continue
+            lines.append('  ' + ', '.join(f'{cause} {runs[c].sum() / total_runs:.1%}'
+                                          for c, cause in enumerate(DEATH_CAUSES) if runs[c].any()))
+
+            # Heat strip from x = 0 to the last bin anything ended in
+            per_bin = frames.sum(axis=0)
+            last = int(np.flatnonzero(runs.sum(axis=0))[-1]) + 1
+            columns = [chunk.sum() for chunk in np.array_split(per_bin[:last], min(width, last))]
+            peak = max(columns) or 1
+            strip = ''.join(HEAT_CHARS[int(round(c / peak * (len(HEAT_CHARS) - 1)))] for c in columns)
+            lines.append(f'  x 0-{last * self.bin_size} |{strip}|')
+
+            ranked = np.argsort(-(frames if sort == 'frames' else runs).sum(axis=0), kind='stable')[:top]
+            lines.append('  {:>13} {:>8} {:>10} {:>7}  {}'.format('x', 'runs', 'frames', 'share', 'causes'))
+            for b in ranked:
+                num_runs = int(runs[:, b].sum())
+                if num_runs == 0:
+                    break
+                num_frames = int(frames[:, b].sum())
+                causes = ', '.join(f'{cause} {runs[c, b]}' for c, cause in enumerate(DEATH_CAUSES) if runs[c, b])
+                x_range = f'{b * self.bin_size}-{(b + 1) * self.bin_size - 1}'
+                lines.append(f'  {x_range:>13} {num_runs:>8} {num_frames:>10} {num_frames / max(total_frames, 1):>7.1%}  {causes}')
+        return '\n'.join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Report where and why individuals stop')
+    parser.add_argument('file', help='Death map saved by training, i.e. [DeathMap] file')
+    parser.add_argument('--top', dest='top', type=int, default=10, help='Number of x bins to list per level')
+    parser.add_argument('--sort', dest='sort', choices=('frames', 'runs'), default='frames', help='Rank x bins by the frames spent by runs ending there or by the number of runs')
+    parser.add_argument('--levels', dest='levels', default=None, help='Comma separated levels to report, i.e. 1-1,2-1. Default is every level')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    levels = args.levels.split(',') if args.levels else None
+    print(DeathMap.load(args.file).report(args.top, args.sort, levels=levels))
@@ -0,0 +1,395 @@
+"""
+Distributed evaluation over plain TCP sockets.
+
+The coordinator owns the population and hands out jobs. A job is a batch of flat genomes for one level.
+When [MultiLevel] lists several levels, the jobs for every level are queued together.
+Workers run the genomes through their own emulator and send back one row per genome with the columns in
+evaluation.RESULT_FIELDS (frames, distance, farthest_x, game_score, did_win, death_cause).
+
+Every message is a '!II' header (json length, body length), a JSON header and a binary body:
+    worker -> coordinator   hello      {config_hash}
+                            heartbeat  {}
+                            result     {job_id}                        body = float64 (num_genomes, num_fields)
+    coordinator -> worker   job        {job_id, level, config_hash,
+                                        num_genomes, num_genes}       body = float64 (num_genomes, num_genes)
+                            error      {message}
+                            shutdown   {}
+
+Each worker connection has at most one job out at a time. If a worker misses heartbeats for heartbeat_timeout
+seconds or disconnects, its job goes back to the front of the queue for another worker.
+
+Usage:
+    python distributed.py coordinator -c settings.config --port 5555 [--local-workers 4] [--generations N] [--debug]
+    python distributed.py worker -c settings.config --host coordinator-host --port 5555 [--processes 8]
+Workers need the same config file. The coordinator rejects workers whose config hash doesn't match.
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import multiprocessing as mp
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import numpy as np
+
+from config import Config
+from death_map import DeathMap
+from emulator import make_env
+from evaluation import run_individual, get_result, set_result, RESULT_FIELDS
+from es import EvolutionStrategy
+from generation import next_generation
+from genetic_algorithm.population import Population
+from mario import Mario, save_mario, save_stats
+from multilevel import get_levels, set_level_results
+from neural_network import flatten_params, unflatten_params
+from surrogate import Surrogate
+
+
+_HEADER = struct.Struct('!II')
+
+
+def get_config_hash(config: Config) -> str:
+    return hashlib.sha1(config._config_text_file.encode('utf-8')).hexdigest()
+
+
+def _recv_exact(sock: socket.socket, num_bytes: int) -> bytes:
+    buf = bytearray(num_bytes)
+    view = memoryview(buf)
+    received = 0
+    while received < num_bytes:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError('Connection closed')
+        received += n
+    return bytes(buf)
+
+
+def send_msg(sock: socket.socket, header: Dict[str, Any], body: bytes = b'') -> None:
+    header_bytes = json.dumps(header).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(header_bytes), len(body)) + header_bytes + body)
+
+
+def recv_msg(sock: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    header_len, body_len = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, header_len).decode('utf-8'))
+    body = _recv_exact(sock, body_len) if body_len else b''
+    return header, body
+
+
+class _Job(object):
+    __slots__ = ['job_id', 'level', 'level_index', 'indices', 'genomes']
+
+    def __init__(self, job_id: int, level: str, level_index: int, indices: np.ndarray, genomes: np.ndarray):
+        self.job_id = job_id
+        self.level = level
+        self.level_index = level_index
+        self.indices = indices
+        self.genomes = genomes
+
+
+class Coordinator(object):
+    def __init__(self, config: Config, host: str = '0.0.0.0', port: int = 5555,
+                 batch_size: int = 8, heartbeat_timeout: float = 30.0, debug: bool = False):
+        self.config_hash = get_config_hash(config)
+        self.batch_size = batch_size
+        self.heartbeat_timeout = heartbeat_timeout
+        self.debug = debug
+
+        self._lock = threading.Condition()
+        self._pending: Deque[_Job] = deque()
+        self._results: Optional[np.ndarray] = None
+        self._remaining = 0
+        self._next_job_id = 0
+        self._closed = False
+        self.num_workers = 0
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen(512)
+        self._accept_thread = threading.Thread(target=self._accept_loop, name='coordinator-accept', daemon=True)
+        self._accept_thread.start()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.getsockname()
+
+    def _accept_loop(self) -> None:
+        while not self._closed:
+            try:
+                conn, addr = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._handle_worker, args=(conn, addr), daemon=True).start()
+
+    def _next_job(self) -> Optional[_Job]:
+        with self._lock:
+            while not self._pending and not self._closed:
+                self._lock.wait()
+            if self._closed:
+                return None
+            return self._pending.popleft()
+
+    def _handle_worker(self, conn: socket.socket, addr: Any) -> None:
+        job = None
+        try:
+            conn.settimeout(self.heartbeat_timeout)
+            header, _ = recv_msg(conn)
+            if header.get('type') != 'hello' or header.get('config_hash') != self.config_hash:
+                send_msg(conn, {'type': 'error', 'message': 'config hash does not match the coordinator'})
+                return
+            with self._lock:
+                self.num_workers += 1
+            if self.debug:
+                print(f'Worker {addr} connected')
+
+            while True:
+                job = self._next_job()
+                if job is None:
+                    send_msg(conn, {'type': 'shutdown'})
+                    return
+                send_msg(conn, {'type': 'job', 'job_id': job.job_id, 'level': job.level, 'config_hash': self.config_hash,
+                                'num_genomes': job.genomes.shape[0], 'num_genes': job.genomes.shape[1]},
+                         job.genomes.tobytes())
+                # Anything other than a heartbeat or the result means the worker is broken
+                while True:
+                    header, body = recv_msg(conn)
+                    if header['type'] == 'heartbeat':
+                        continue
+                    if header['type'] == 'result' and header['job_id'] == job.job_id:
+                        break
+                    raise ConnectionError(f'Unexpected message {header}')
+
+                results = np.frombuffer(body, np.float64).reshape((job.genomes.shape[0], len(RESULT_FIELDS)))
+                with self._lock:
+                    self._results[job.level_index, job.indices] = results
+                    self._remaining -= len(job.indices)
+                    self._lock.notify_all()
+                job = None
+        except (OSError, ConnectionError, ValueError) as e:
+            if self.debug:
+                print(f'Lost worker {addr}: {e}')
+        finally:
+            with self._lock:
+                self.num_workers -= 1
+                # Someone else needs to do the job
+                if job is not None:
+                    self._pending.appendleft(job)
+                    self._lock.notify_all()
+            conn.close()
+
+    def evaluate(self, genomes: np.ndarray, level: str) -> np.ndarray:
+        """
+        Evaluate every row of genomes on a level and return a (num_genomes, len(RESULT_FIELDS)) array.
+        Blocks until every genome has a result.
+        """
+        return self.evaluate_levels(genomes, [level])[0]
+
+    def evaluate_levels(self, genomes: np.ndarray, levels: List[str]) -> np.ndarray:
+        """
+        Evaluate every row of genomes on every level and return a (num_levels, num_genomes, len(RESULT_FIELDS)) array.
+        The jobs for all levels are queued at once so the levels run at the same time on different workers.
+        """
+        genomes = np.ascontiguousarray(genomes, np.float64)
+        with self._lock:
+            self._results = np.zeros((len(levels), genomes.shape[0], len(RESULT_FIELDS)))
+            self._remaining = len(levels) * genomes.shape[0]
+            # Jobs are queued level by level so a worker mostly stays on one level and doesn't keep recreating its env
+            for level_index, level in enumerate(levels):
+                for start in range(0, genomes.shape[0], self.batch_size):
+                    indices = np.arange(start, min(start + self.batch_size, genomes.shape[0]))
+                    self._pending.append(_Job(self._next_job_id, level, level_index, indices, genomes[indices]))
+                    self._next_job_id += 1
+            self._lock.notify_all()
+
+            while self._remaining > 0:
+                self._lock.wait()
+            return self._results
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        self._server.close()
+
+
+def run_worker(host: str, port: int, config_filename: str, heartbeat_interval: float = 5.0,
+               env_factory: Callable[[str], Any] = None, debug: bool = False) -> None:
+    config = Config(config_filename)
+    env_factory = env_factory or (lambda level: make_env(level, ram_only=True))
+    layer_nodes = Mario(config).network.layer_nodes
+
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    send_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(heartbeat_interval):
+            try:
+                with send_lock:
+                    send_msg(sock, {'type': 'heartbeat'})
+            except OSError:
+                return
+
+    with send_lock:
+        send_msg(sock, {'type': 'hello', 'config_hash': get_config_hash(config), 'pid': os.getpid()})
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    # Only one emulator is allowed per process, so the env is recreated if the level changes
+    env = None
+    env_level = None
+    try:
+        while True:
+            header, body = recv_msg(sock)
+            if header['type'] == 'shutdown':
+                return
+            if header['type'] == 'error':
+                raise Exception(header['message'])
+
+            if env_level != header['level']:
+                if env is not None:
+                    env.close()
+                env = env_factory(header['level'])
+                env_level = header['level']
+
+            genomes = np.frombuffer(body, np.float64).reshape((header['num_genomes'], header['num_genes']))
+            results = np.empty((genomes.shape[0], len(RESULT_FIELDS)))
+            for i, genome in enumerate(genomes):
+                mario = Mario(config, unflatten_params(genome.copy(), layer_nodes))
+                run_individual(env, mario)
+                results[i] = get_result(mario)
+
+            with send_lock:
+                send_msg(sock, {'type': 'result', 'job_id': header['job_id']}, results.tobytes())
+            if debug:
+                print(f'[worker {os.getpid()}] finished job {header["job_id"]} ({genomes.shape[0]} genomes)')
+    except ConnectionError:
+        pass
+    finally:
+        stop.set()
+        if env is not None:
+            env.close()
+        sock.close()
+
+
+def start_local_workers(num_workers: int, host: str, port: int, config_filename: str,
+                        env_factory: Callable[[str], Any] = None, debug: bool = False) -> List[mp.Process]:
+    workers = []
+    for _ in range(num_workers):
+        p = mp.Process(target=run_worker, args=(host, port, config_filename),
+                       kwargs={'env_factory': env_factory, 'debug': debug}, daemon=True)
+        p.start()
+        workers.append(p)
+    return workers
+
+
+def evaluate_population(coordinator: Coordinator, population: Population, levels: List[str], config: Config) -> np.ndarray:
+    """
+    Evaluate every individual of a population on the levels through the coordinator and set their results.
+    With more than one level the per-level fitness is aggregated by the [MultiLevel] reducer.
+    Returns the (num_levels, num_individuals, len(RESULT_FIELDS)) results.
+    """
+    layer_nodes = population.individuals[0].network.layer_nodes
+    genomes = np.stack([flatten_params(individual.network.params, layer_nodes) for individual in population.individuals])
+    results = coordinator.evaluate_levels(genomes, levels)
+    for i, individual in enumerate(population.individuals):
+        if len(levels) == 1:
+            set_result(individual, results[0, i])
+        else:
+            set_level_results(config, individual, levels, results[:, i])
+    return results
+
+
+def run_coordinator(config: Config, coordinator: Coordinator, generations: Optional[int] = None, debug: bool = False) -> None:
+    if config.Novelty.mode != 'off':
+        raise Exception('[Novelty] is not supported since workers only send back results')
+    if config.Racing.enabled:
+        raise Exception('[Racing] is not supported since workers run individuals to the end')
+    if config.Trajectories.enabled:
+        raise Exception('[Trajectories] is not supported since workers only send back results')
+    if config.SteadyState.enabled:
+        raise Exception('[SteadyState] is not supported since jobs are batches of a generation')
+    levels = get_levels(config)
+    es = EvolutionStrategy.from_config(config)
+    surrogate = Surrogate.from_config(config)
+    death_map = DeathMap.from_config(config)
+    population = Population([Mario(config) for _ in range(config.Selection.num_parents)])
+    generation = 0
+    while generations is None or generation < generations:
+        start = time.time()
+        # Stats only cover the individuals that were emulated
+        evaluated = Population(surrogate.select(population.individuals)) if surrogate else population
+        results = evaluate_population(coordinator, evaluated, levels, config)
+        if surrogate:
+            surrogate.finish()
+        if death_map:
+            for level, level_results in zip(levels, results):
+                death_map.add_results(level, level_results)
+            death_map.save()
+        if debug:
+            fittest = population.fittest_individual
+            num_wins = sum(individual.did_win for individual in evaluated.individuals)
+            frames = sum(individual._frames for individual in evaluated.individuals)
+            elapsed = time.time() - start
+            print(f'----Gen {generation}: best fitness {fittest.fitness:.2f}, max dist {fittest.farthest_x}, '
+                  f'wins {num_wins}/{len(population.individuals)}, {frames / elapsed:.0f} frames/s on {coordinator.num_workers} workers')
+
+        if config.Statistics.save_best_individual_from_generation:
+            save_mario(config.Statistics.save_best_individual_from_generation, f'best_ind_gen{generation}', population.fittest_individual)
+        if config.Statistics.save_population_stats:
+            save_stats(evaluated, config.Statistics.save_population_stats)
+
+        generation += 1
+        if es:
+            population.individuals = es.next_generation(population, generation)
+        else:
+            population.individuals = next_generation(population, config, generation)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Super Mario Bros AI distributed evaluation')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    coordinator = subparsers.add_parser('coordinator', help='Run the GA and hand out evaluation jobs')
+    coordinator.add_argument('-c', '--config', dest='config', required=True, help='config file to use')
+    coordinator.add_argument('--host', dest='host', default='0.0.0.0', help='Address to listen on')
+    coordinator.add_argument('--port', dest='port', type=int, default=5555, help='Port to listen on')
+    coordinator.add_argument('--batch-size', dest='batch_size', type=int, default=8, help='Genomes per job')
+    coordinator.add_argument('--heartbeat-timeout', dest='heartbeat_timeout', type=float, default=30.0, help='Seconds without hearing from a worker before its job is re-dispatched')
+    coordinator.add_argument('--local-workers', dest='local_workers', type=int, default=0, help='Number of worker processes to start on this machine')
+    coordinator.add_argument('--generations', dest='generations', type=int, default=None, help='Stop after this many generations')
+    coordinator.add_argument('--debug', dest='debug', default=False, action='store_true', help='If set, print progress')
+
+    worker = subparsers.add_parser('worker', help='Evaluate genomes for a coordinator')
+    worker.add_argument('-c', '--config', dest='config', required=True, help='config file to use. Must match the coordinator')
+    worker.add_argument('--host', dest='host', default='127.0.0.1', help='Coordinator address')
+    worker.add_argument('--port', dest='port', type=int, default=5555, help='Coordinator port')
+    worker.add_argument('--processes', dest='processes', type=int, default=1, help='Number of worker processes to run')
+    worker.add_argument('--debug', dest='debug', default=False, action='store_true', help='If set, print progress')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'coordinator':
+        config = Config(args.config)
+        coordinator = Coordinator(config, args.host, args.port, args.batch_size, args.heartbeat_timeout, args.debug)
+        if args.local_workers:
+            host = '127.0.0.1' if args.host == '0.0.0.0' else args.host
+            start_local_workers(args.local_workers, host, coordinator.address[1], args.config, debug=args.debug)
+        try:
+            run_coordinator(config, coordinator, args.generations, args.debug)
+        finally:
+            coordinator.close()
+    elif args.command == 'worker':
+        workers = start_local_workers(args.processes, args.host, args.port, args.config, debug=args.debug)
+        for p in workers:
+            p.join()
@@ -0,0 +1,47 @@
+from typing import Any
+import numpy as np
+
+
+def make_env(level: str, ram_only: bool = False) -> Any:
+    """
+    Create the Super Mario Bros environment for a given level, i.e. '1-1'.
+    If ram_only is set, the environment uses RAM observations so that `reset` and `step`
+    return the 2048 byte RAM view instead of a 240x256x3 screen. This is what headless
+    training should use since the screen is never looked at.
+    """
+    # retro is imported here so modules that only need the environment interface
+    # (traces, benchmarks, etc.) don't require the emulator to be installed
+    import retro
+
+    if ram_only:
+        return retro.make(game='SuperMarioBros-Nes', state=f'Level{level}', obs_type=retro.Observations.RAM)
+    return retro.make(game='SuperMarioBros-Nes', state=f'Level{level}')
+
+
+def get_ram_from_obs(env: Any, obs: np.ndarray) -> np.ndarray:
+    """
+    Return the RAM for the frame that produced obs.
+    RAM observations are 1D and can be used as is, otherwise the RAM has to be grabbed from the environment.
+    """
+    if obs.ndim == 1:
+        return obs
+    return env.get_ram()
+
+
+def get_state(env: Any) -> Any:
+    """
+    Savestate of the environment so a run can be resumed later with set_state.
+    retro keeps it on the emulator, other environments (i.e. TraceEnv) provide get_state themselves.
+    """
+    em = getattr(env, 'em', None)
+    if em is not None:
+        return em.get_state()
+    return env.get_state()
+
+
+def set_state(env: Any, state: Any) -> None:
+    em = getattr(env, 'em', None)
+    if em is not None:
+        em.set_state(state)
+    else:
+        env.set_state(state)
@@ -0,0 +1,135 @@
+"""
+Evolution strategy over the flat genome (see neural_network.flatten_params), used instead of the GA when
+[GeneticAlgorithm] optimizer = es.
+
+This is the OpenAI-ES variant: a generation is the mean genome plus sigma times population_size Gaussian
+perturbations, sampled antithetically so every perturbation eps is paired with -eps. The fitness is replaced by its
+centered rank, which makes the update independent of the scale of fitness_func, and the gradient estimate is a
+single matrix product of the ranks with the perturbations. The mean is updated with Adam.
+
+The first generation is whatever population the GA would start with (random or loaded individuals). The fittest
+of it becomes the starting mean.
+"""
+from typing import List, Optional
+import numpy as np
+
+from config import Config
+from genetic_algorithm.population import Population
+from mario import Mario
+from neural_network import flatten_params, unflatten_params
+from novelty import NoveltyArchive
+
+
+def centered_ranks(fitness: np.ndarray) -> np.ndarray:
+    """
+    Ranks of fitness scaled to [-0.5, 0.5]. Ties get an arbitrary but distinct rank.
+    """
+    ranks = np.empty(len(fitness))
+    ranks[np.argsort(fitness, kind='stable')] = np.arange(len(fitness))
+    if len(fitness) > 1:
+        ranks /= len(fitness) - 1
+    return ranks - 0.5
+
+
+class EvolutionStrategy(object):
+    def __init__(self, config: Config):
+        self.config = config
+        es = config.EvolutionStrategy
+        if es.population_size < 2 or es.population_size % 2:
+            raise Exception('[EvolutionStrategy] population_size must be even and at least 2')
+        self.population_size = es.population_size
+        self.sigma = es.sigma
+        self.learning_rate = es.learning_rate
+        self.weight_decay = es.weight_decay
+        self.beta1 = es.beta1
+        self.beta2 = es.beta2
+
+        self.mean: Optional[np.ndarray] = None
+        self.layer_nodes: Optional[List[int]] = None
+        self._m = None
+        self._v = None
+        self._t = 0
+        # The perturbations of the generation being evaluated, (population_size // 2, num_genes)
+        self._noise: Optional[np.ndarray] = None
+        self._asked: Optional[List[Mario]] = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional['EvolutionStrategy']:
+        """
+        None when the GA is the optimizer
+        """
+        optimizer = config.GeneticAlgorithm.optimizer
+        if optimizer == 'ga':
+            return None
+        elif optimizer == 'es':
+            return cls(config)
+        raise Exception(f'Unknown optimizer "{optimizer}". Options are (ga, es)')
+
+    def _start(self, population: Population) -> None:
+        fittest = population.fittest_individual
+        self.layer_nodes = fittest.network.layer_nodes
+        self.mean = flatten_params(fittest.network.params, self.layer_nodes)
+        self._m = np.zeros_like(self.mean)
+        self._v = np.zeros_like(self.mean)
+        self._t = 0
+
+    def ask(self) -> np.ndarray:
+        """
+        Sample the genomes of the next generation, (population_size, num_genes). Row i + population_size // 2
+        is the mirror of row i.
+        """
+        half = self.population_size // 2
+        self._noise = np.random.standard_normal((half, len(self.mean)))
+        genomes = np.empty((self.population_size, len(self.mean)))
+        np.multiply(self._noise, self.sigma, out=genomes[:half])
+        np.negative(genomes[:half], out=genomes[half:])
+        genomes += self.mean
+        return genomes
+
+    def tell(self, fitness: np.ndarray) -> None:
+        """
+        Update the mean from the fitness of the genomes returned by the last ask
+        """
+        half = self.population_size // 2
+        ranks = centered_ranks(np.asarray(fitness, np.float64))
+        # Antithetic pairs share their noise, so the estimate only needs the difference of their ranks
+        grad = (ranks[:half] - ranks[half:]) @ self._noise / (self.population_size * self.sigma)
+        # Ascend the fitness, descend the L2 penalty
+        grad -= self.weight_decay * self.mean
+
+        self._t += 1
+        self._m *= self.beta1
+        self._m += (1 - self.beta1) * grad
+        self._v *= self.beta2
+        self._v += (1 - self.beta2) * grad * grad
+        step_size = self.learning_rate * np.sqrt(1 - self.beta2 ** self._t) / (1 - self.beta1 ** self._t)
+        self.mean += step_size * self._m / (np.sqrt(self._v) + 1e-8)
+        self._noise = None
+
+    def next_generation(self, population: Population, current_generation: int, debug: bool = False,
+                        novelty: Optional[NoveltyArchive] = None) -> List[Mario]:
+        """
+        Same contract as generation.next_generation. If the population came from the last ask, its fitness
+        updates the mean. Otherwise it's a fresh population and its fittest individual becomes the mean.
+        """
+        if novelty is not None:
+            novelty.score(population)
+
+        if self._asked is not None and population.individuals == self._asked:
+            self.tell(np.array([individual.fitness for individual in population.individuals]))
+        else:
+            self._start(population)
+
+        # Elitism selection keeps only the parents in the population, so only keep the best one here
+        population.individuals = [population.fittest_individual]
+
+        genomes = self.ask()
+        next_pop = []
+        for i, genome in enumerate(genomes):
+            m = Mario(self.config, unflatten_params(genome, self.layer_nodes))
+            if debug:
+                m.name = f'm{i}_es'
+                m.debug = True
+            next_pop.append(m)
+        self._asked = next_pop
+        return list(next_pop)
@@ -0,0 +1,108 @@
+from typing import Any, Callable, Optional
+import numpy as np
+
+from action_log import ActionLog
+from emulator import get_ram_from_obs
+from genetic_algorithm.population import Population
+from mario import Mario
+from trajectory_store import TrajectoryStore
+from utils import SMB
+import profiling
+
+
+# Keys correspond with B, NULL, SELECT, START, U, D, L, R, A
+# index                0  1     2       3      4  5  6  7  8
+# The network outputs U, D, L, R, A, B and this maps the output index to the key index
+OUTPUT_TO_KEYS_MAP = {
+    0: 4,  # U
+    1: 5,  # D
+    2: 6,  # L
+    3: 7,  # R
+    4: 8,  # A
+    5: 0   # B
+}
+
+
+# Columns of an evaluation result so results can be passed around as a single array
+RESULT_FIELDS = ('frames', 'distance', 'farthest_x', 'game_score', 'did_win', 'death_cause')
+
+
+def get_result(mario: Mario) -> np.ndarray:
+    return np.array([mario._frames, mario.x_dist or 0, mario.farthest_x, mario.game_score or 0, mario.did_win,
+                     mario.death_cause], np.float64)
+
+
+def set_result(mario: Mario, result: np.ndarray) -> None:
+    """
+    Set the stats of an individual that was evaluated somewhere else and calculate its fitness
+    """
+    frames, distance, farthest_x, game_score, did_win, death_cause = result
+    mario._frames = int(frames)
+    mario.x_dist = int(distance)
+    mario.farthest_x = int(farthest_x)
+    mario.game_score = int(game_score)
+    mario.did_win = bool(did_win)
+    mario.death_cause = int(death_cause)
+    mario.is_alive = False
+    mario.calculate_fitness()
+
+
+def advance_individual(env: Any, mario: Mario, max_frames: Optional[int] = None,
+                       on_frame: Optional[Callable[[np.ndarray], None]] = None,
+                       action_log: Optional[ActionLog] = None, trajectories: Optional[TrajectoryStore] = None) -> None:
+    """
+    Step the environment with the buttons mario presses until it dies or has been alive for max_frames frames.
+    The environment has to be at the frame mario is on, i.e. just reset for a new individual or restored with
+    emulator.set_state to where the individual was stopped. The fitness is not calculated.
+    If trajectories is given, every frame mario decides the buttons for is recorded in it.
+    """
+    prof = profiling.profiler
+    keys = np.zeros(9, np.int8)
+    while mario.is_alive and (max_frames is None or mario._frames < max_frames):
+        if action_log is not None:
+            action_log.append(mario.buttons_to_press)
+        t = prof.start()
+        obs, _, done, _ = env.step(mario.buttons_to_press)
+        prof.stop('env_step', t)
+        t = prof.start()
+        ram = get_ram_from_obs(env, obs)
+        tiles = SMB.get_tiles(ram)
+        prof.stop('ram_decode', t)
+        if on_frame is not None:
+            on_frame(ram)
+        mario.update(ram, tiles, keys, OUTPUT_TO_KEYS_MAP)
+        if trajectories is not None and mario.is_alive:
+            trajectories.record(mario)
+        if done:
+            mario.is_alive = False
+
+
+def run_individual(env: Any, mario: Mario, max_frames: Optional[int] = None,
+                   on_frame: Optional[Callable[[np.ndarray], None]] = None, record_actions: bool = False,
+                   trajectories: Optional[TrajectoryStore] = None) -> Mario:
+    """
+    Run a single individual through the environment until it dies and calculate its fitness.
+    This is the same loop as MainWindow._update without anything related to the display.
+    The run also ends if the environment says it's done (i.e. a recorded trace ran out) or after max_frames.
+    on_frame is called with the RAM of every frame before the individual sees it.
+    If record_actions is set, the buttons pressed each frame are kept in mario.action_log.
+    """
+    action_log = None
+    if record_actions:
+        action_log = mario.action_log = ActionLog()
+    env.reset()
+    advance_individual(env, mario, max_frames, on_frame, action_log, trajectories)
+    mario.is_alive = False
+    mario.calculate_fitness()
+    return mario
+
+
+def evaluate_population(env: Any, population: Population) -> int:
+    """
+    Run every individual of the population one after another. Returns the number of frames emulated.
+    """
+    frames = 0
+    for individual in population.individuals:
+        run_individual(env, individual)
+        frames += individual._frames
+    return frames
@@ -0,0 +1,261 @@
+"""
+Fork-server evaluation workers.
+
+Creating an env means importing retro, loading the ROM and loading the Level{level} state, which is slow and is
+repeated by every new process. Here a template process does all of that once: it imports the modules, creates the
+env and resets it, so the start state of the level is already loaded in memory. Workers are forked from the template
+and share its memory copy-on-write, so a new worker is ready as soon as the fork returns.
+
+Workers connect back over a unix socket. The genomes and results live in shared memory (see shared_population.py),
+so a job is only a range of individuals to evaluate. After max_jobs batches a worker exits
+and a fresh one is forked, which keeps memory growth of long running workers in check. With profiling enabled each
+worker sends its stage timings and counters back with every job.
+
+evaluate runs a whole population and returns once every individual is done. evaluate_steady hands out one
+individual at a time and gives a worker the next one as soon as it finishes, for the steady-state GA.
+
+Only works where os.fork is available.
+"""
+import os
+import secrets
+import signal
+import time
+import multiprocessing as mp
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Listener, Client, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from emulator import make_env
+from evaluation import run_individual, get_result, set_result, RESULT_FIELDS
+from genetic_algorithm.population import Population
+from mario import Mario
+from neural_network import get_num_params, flatten_params
+from shared_population import SharedPopulation
+import profiling
+
+
+def _evaluate_rows(env: Any, config: Config, layer_nodes: List[int], shared: SharedPopulation, start: int, stop: int) -> None:
+    for i in range(start, stop):
+        mario = Mario(config, shared.get_params(i, layer_nodes))
+        run_individual(env, mario)
+        shared.write_result(i, get_result(mario), mario.fitness)
+
+
+def _worker_main(env: Any, config: Config, layer_nodes: List[int], address: str, authkey: bytes, max_jobs: int) -> None:
+    conn = Client(address, authkey=authkey)
+    shared = None
+    # Forked with whatever the main process had recorded by then
+    prof = profiling.profiler
+    if prof.enabled:
+        prof.reset()
+    try:
+        for job in range(max_jobs):
+            msg = conn.recv()
+            if msg is None:
+                return
+            shared_args, start, stop = msg
+            # A new population size means new blocks
+            if shared is None or shared.names != shared_args[2]:
+                if shared is not None:
+                    shared.close()
+                shared = SharedPopulation(*shared_args)
+            _evaluate_rows(env, config, layer_nodes, shared, start, stop)
+            # The last job tells the pool this worker is done so it can fork a new one
+            conn.send((job == max_jobs - 1, prof.take() if prof.enabled else None))
+    except EOFError:
+        pass
+    finally:
+        if shared is not None:
+            shared.close()
+        conn.close()
+
+
+def _template_main(control: Any, config_filename: str, level: str, address: str, authkey: bytes,
+                   max_jobs: int, env_factory: Optional[Callable[[str], Any]]) -> None:
+    # Forked workers are never waited on, so let the kernel reap them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    config = Config(config_filename)
+    env = env_factory(level) if env_factory else make_env(level, ram_only=True)
+    env.reset()
+    layer_nodes = Mario(config).network.layer_nodes
+
+    while True:
+        try:
+            msg = control.recv()
+        except EOFError:
+            break
+        if msg != 'fork':
+            break
+        pid = os.fork()
+        if pid == 0:
+            control.close()
+            code = 0
+            try:
+                _worker_main(env, config, layer_nodes, address, authkey, max_jobs)
+            except BaseException:
+                code = 1
+            finally:
+                # Skip the cleanup of the template, i.e. atexit handlers and closing the env
+                os._exit(code)
+        control.send(pid)
+    env.close()
+
+
+class ForkServerPool(object):
+    def __init__(self, config: Config, level: Optional[str] = None, num_workers: int = 1, max_jobs: int = 100,
+                 batch_size: int = 4, env_factory: Callable[[str], Any] = None):
+        """
+        Starts the template process for a level (default [Misc] level) and forks num_workers workers from it.
+        A worker evaluates batches of batch_size genomes and is replaced after max_jobs batches.
+        """
+        if not hasattr(os, 'fork'):
+            raise Exception('ForkServerPool needs os.fork')
+        self.config = config
+        self.level = level or config.Misc.level
+        self.num_workers = num_workers
+        self.max_jobs = max_jobs
+        self.batch_size = batch_size
+        self.num_forked = 0
+        # Total seconds workers spent on jobs, from sending a job to getting its result
+        self.busy_s = 0.0
+
+        # Workers attach to the shared memory blocks. If they inherit the tracker of this process, it doesn't
+        # unlink the blocks when a worker exits
+        resource_tracker.ensure_running()
+
+        authkey = secrets.token_bytes(16)
+        self._listener = Listener(family='AF_UNIX', authkey=authkey)
+        self._control, template_control = mp.Pipe()
+        self._template = mp.get_context('fork').Process(
+            target=_template_main, name='forkserver-template', daemon=True,
+            args=(template_control, config.filename, self.level, self._listener.address, authkey, max_jobs, env_factory))
+        self._template.start()
+        template_control.close()
+
+        self._workers: List[Any] = [self._fork() for _ in range(num_workers)]
+        self._shared: Optional[SharedPopulation] = None
+
+    def _fork(self) -> Any:
+        self._control.send('fork')
+        self._control.recv()
+        self.num_forked += 1
+        return self._listener.accept()
+
+    def evaluate(self, population: Population) -> int:
+        """
+        Evaluate every individual and set its results. Returns the number of frames emulated.
+        The genomes are written to shared memory and workers are only sent ranges of individuals to run.
+        """
+        individuals = population.individuals
+        num_genes = get_num_params(individuals[0].network.layer_nodes)
+        if self._shared is None or (self._shared.num_individuals, self._shared.num_genes) != (len(individuals), num_genes):
+            if self._shared is not None:
+                self._shared.close()
+            self._shared = SharedPopulation(len(individuals), num_genes)
+        shared = self._shared
+        shared.write_genomes(individuals)
+        shared_args = (shared.num_individuals, shared.num_genes, shared.names)
+
+        batches = [(start, min(start + self.batch_size, len(individuals))) for start in range(0, len(individuals), self.batch_size)]
+        batches.reverse()
+        running: Dict[Any, float] = {}
+        idle = list(self._workers)
+        while batches or running:
+            while batches and idle:
+                conn = idle.pop()
+                start, stop = batches.pop()
+                conn.send((shared_args, start, stop))
+                running[conn] = time.perf_counter()
+
+            for conn in wait(list(running)):
+                self.busy_s += time.perf_counter() - running.pop(conn)
+                idle.append(self._finish_job(conn))
+
+        shared.read_results(individuals)
+        return int(shared.results[:, 0].sum())
+
+    def _finish_job(self, conn: Any) -> Any:
+        """
+        Receive the end of a job from a worker and merge its profiling. Returns the connection to send the next job
+        to, which is a new worker if this one retired.
+        """
+        retired, taken = conn.recv()
+        if taken is not None:
+            profiling.profiler.merge(taken)
+        if retired:
+            conn.close()
+            self._workers.remove(conn)
+            conn = self._fork()
+            self._workers.append(conn)
+        return conn
+
+    def evaluate_steady(self, ask: Callable[[], Optional[Mario]], tell: Callable[[Mario], None]) -> int:
+        """
+        Evaluate individuals one at a time as they are asked for, without waiting for a whole population.
+        Each worker runs the individual from ask(). As soon as it finishes, its results are set, tell is called with it
+        and the worker gets the next ask() right away, so a slow run only holds up its own worker.
+        Once ask returns None, the running individuals are finished and the number of frames emulated is returned.
+        """
+        individual = ask()
+        if individual is None:
+            return 0
+        layer_nodes = individual.network.layer_nodes
+        # One genome slot per worker. A worker keeps its slot when it's replaced
+        shared = SharedPopulation(self.num_workers, get_num_params(layer_nodes))
+        shared_args = (shared.num_individuals, shared.num_genes, shared.names)
+        slots = {conn: slot for slot, conn in enumerate(self._workers)}
+        running: Dict[Any, Any] = {}
+        frames = 0
+        try:
+            idle = list(self._workers)
+            # The next individual is only asked for once a worker is free, so it's made from the latest results
+            stopped = False
+            while True:
+                while idle and not stopped:
+                    if individual is None:
+                        individual = ask()
+                        if individual is None:
+                            stopped = True
+                            break
+                    conn = idle.pop()
+                    slot = slots[conn]
+                    flatten_params(individual.network.params, layer_nodes, out=shared.genomes[slot])
+                    conn.send((shared_args, slot, slot + 1))
+                    running[conn] = (individual, time.perf_counter())
+                    individual = None
+                if not running:
+                    break
+
+                for conn in wait(list(running)):
+                    done, start = running.pop(conn)
+                    self.busy_s += time.perf_counter() - start
+                    slot = slots.pop(conn)
+                    conn = self._finish_job(conn)
+                    slots[conn] = slot
+                    idle.append(conn)
+                    set_result(done, shared.results[slot, :len(RESULT_FIELDS)])
+                    frames += done._frames
+                    tell(done)
+        finally:
+            shared.close()
+        return frames
+
+    def close(self) -> None:
+        for conn in self._workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        self._workers = []
+        try:
+            self._control.send('exit')
+        except OSError:
+            pass
+        self._template.join()
+        self._listener.close()
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
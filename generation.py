@@ -0,0 +1,179 @@
+import math
+import random
+from typing import List, Optional, Tuple
+import numpy as np
+
+from config import Config
+from mario import Mario
+from genetic_algorithm.population import Population
+from genetic_algorithm.selection import elitism_selection, tournament_selection, roulette_wheel_selection
+from genetic_algorithm.operators import get_crossover, get_mutation
+from novelty import NoveltyArchive
+
+
+def get_next_gen_size(config: Config) -> int:
+    """
+    Determine the size of the next generation based off selection type, or the ES population size
+    """
+    if config.GeneticAlgorithm.optimizer == 'es':
+        return config.EvolutionStrategy.population_size
+    if config.Selection.selection_type == 'plus':
+        return config.Selection.num_parents + config.Selection.num_offspring
+    elif config.Selection.selection_type == 'comma':
+        return config.Selection.num_offspring
+    raise Exception('Unkown Selection type "{}"'.format(config.Selection.selection_type))
+
+
+def crossover(config: Config, parent1_weights: np.ndarray, parent2_weights: np.ndarray,
+              parent1_bias: np.ndarray, parent2_bias: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Create the children with the [Crossover] crossover_type. With probability 1 - probability_sbx
+    the children are copies of the parents.
+    """
+    crossover_kernel = get_crossover(config)
+    children = []
+    for parent1, parent2 in ((parent1_weights, parent2_weights), (parent1_bias, parent2_bias)):
+        child1, child2 = np.empty_like(parent1), np.empty_like(parent2)
+        if random.random() < config.Crossover.probability_sbx:
+            crossover_kernel(parent1, parent2, child1, child2)
+        else:
+            np.copyto(child1, parent1)
+            np.copyto(child2, parent2)
+        children.append((child1, child2))
+
+    (child1_weights, child2_weights), (child1_bias, child2_bias) = children
+    return child1_weights, child2_weights, child1_bias, child2_bias
+
+
+def mutation(config: Config, current_generation: int, child1_weights: np.ndarray, child2_weights: np.ndarray,
+             child1_bias: np.ndarray, child2_bias: np.ndarray) -> None:
+    """
+    Mutate the children in place with the [Mutation] mutation_type
+    """
+    mutation_rate = config.Mutation.mutation_rate
+    mutation_kernel = get_mutation(config)
+
+    if config.Mutation.mutation_rate_type == 'dynamic':
+        mutation_rate = mutation_rate / math.sqrt(current_generation + 1)
+
+    # Mutate weights
+    mutation_kernel(child1_weights, mutation_rate)
+    mutation_kernel(child2_weights, mutation_rate)
+
+    # Mutate bias
+    mutation_kernel(child1_bias, mutation_rate)
+    mutation_kernel(child2_bias, mutation_rate)
+
+
+def make_children(population: Population, config: Config, current_generation: int) -> Tuple[Mario, Mario]:
+    """
+    Select two parents from population and create two children with crossover and mutation
+    """
+    selection = config.Crossover.crossover_selection
+    if selection == 'tournament':
+        p1, p2 = tournament_selection(population, 2, config.Crossover.tournament_size)
+    elif selection == 'roulette':
+        p1, p2 = roulette_wheel_selection(population, 2)
+    else:
+        raise Exception('crossover_selection "{}" is not supported'.format(selection))
+
+    L = len(p1.network.layer_nodes)
+    c1_params = {}
+    c2_params = {}
+
+    # Each W_l and b_l are treated as their own chromosome.
+    # Because of this I need to perform crossover/mutation on each chromosome between parents
+    for l in range(1, L):
+        p1_W_l = p1.network.params['W' + str(l)]
+        p2_W_l = p2.network.params['W' + str(l)]
+        p1_b_l = p1.network.params['b' + str(l)]
+        p2_b_l = p2.network.params['b' + str(l)]
+
+        # Crossover
+        # @NOTE: I am choosing to perform the same type of crossover on the weights and the bias.
+        c1_W_l, c2_W_l, c1_b_l, c2_b_l = crossover(config, p1_W_l, p2_W_l, p1_b_l, p2_b_l)
+
+        # Mutation
+        # @NOTE: I am choosing to perform the same type of mutation on the weights and the bias.
+        mutation(config, current_generation, c1_W_l, c2_W_l, c1_b_l, c2_b_l)
+
+        # Assign children from crossover/mutation
+        c1_params['W' + str(l)] = c1_W_l
+        c2_params['W' + str(l)] = c2_W_l
+        c1_params['b' + str(l)] = c1_b_l
+        c2_params['b' + str(l)] = c2_b_l
+
+        #  Clip to [-1, 1]
+        np.clip(c1_params['W' + str(l)], -1, 1, out=c1_params['W' + str(l)])
+        np.clip(c2_params['W' + str(l)], -1, 1, out=c2_params['W' + str(l)])
+        np.clip(c1_params['b' + str(l)], -1, 1, out=c1_params['b' + str(l)])
+        np.clip(c2_params['b' + str(l)], -1, 1, out=c2_params['b' + str(l)])
+
+
+    c1 = Mario(config, c1_params, p1.hidden_layer_architecture, p1.hidden_activation, p1.output_activation, p1.lifespan)
+    c2 = Mario(config, c2_params, p2.hidden_layer_architecture, p2.hidden_activation, p2.output_activation, p2.lifespan)
+
+    return c1, c2
+
+
+def next_generation(population: Population, config: Config, current_generation: int, debug: bool = False,
+                    novelty: Optional[NoveltyArchive] = None) -> List[Mario]:
+    """
+    Create the individuals of the next generation from an evaluated population.
+    The population keeps only the elite parents once this returns.
+    With a novelty archive the parents are selected on the fitness set by NoveltyArchive.score.
+    """
+    next_gen_size = get_next_gen_size(config)
+    if novelty is not None:
+        novelty.score(population)
+    population.individuals = elitism_selection(population, config.Selection.num_parents)
+
+    random.shuffle(population.individuals)
+    next_pop = []
+
+    # Parents + offspring
+    if config.Selection.selection_type == 'plus':
+        # Decrement lifespan
+        for individual in population.individuals:
+            individual.lifespan -= 1
+
+        for individual in population.individuals:
+            ind_config = individual.config
+            chromosome = individual.network.params
+            hidden_layer_architecture = individual.hidden_layer_architecture
+            hidden_activation = individual.hidden_activation
+            output_activation = individual.output_activation
+            lifespan = individual.lifespan
+            name = individual.name
+
+            # If the indivdual would be alve, add it to the next pop
+            if lifespan > 0:
+                m = Mario(ind_config, chromosome, hidden_layer_architecture, hidden_activation, output_activation, lifespan)
+                # Set debug if needed
+                if debug:
+                    m.name = f'{name}_life{lifespan}'
+                    m.debug = True
+                next_pop.append(m)
+
+    num_loaded = 0
+
+    while len(next_pop) < next_gen_size:
+        c1, c2 = make_children(population, config, current_generation)
+
+        # Set debug if needed
+        if debug:
+            c1_name = f'm{num_loaded}_new'
+            c1.name = c1_name
+            c1.debug = True
+            num_loaded += 1
+
+            c2_name = f'm{num_loaded}_new'
+            c2.name = c2_name
+            c2.debug = True
+            num_loaded += 1
+
+        next_pop.extend([c1, c2])
+
+    # Set next generation
+    random.shuffle(next_pop)
+    return next_pop
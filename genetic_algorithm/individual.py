@@ -4,6 +4,9 @@ from typing import Optional, Union
 import numpy as np
 
 class Individual(object):
+    # Lets subclasses use __slots__
+    __slots__ = ()
+
     def __init__(self):
         pass
 
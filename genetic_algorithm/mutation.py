@@ -53,8 +53,13 @@ def uniform_mutation_with_respect_to_best_individual(chromosome: np.ndarray, bes
     uniform_mutation = np.random.uniform(size=chromosome.shape)
     chromosome[mutation_array] += uniform_mutation[mutation_array] * (best_chromosome[mutation_array] - chromosome[mutation_array])
 
-def cauchy_mutation(individual: np.ndarray, scale: float) -> np.ndarray:
-    pass
+def cauchy_mutation(chromosome: np.ndarray, prob_mutation: float, scale: float = 1.0) -> None:
+    """
+    Perform a Cauchy(0, scale) mutation for each gene in an individual with probability, prob_mutation.
+    """
+    mutation_array = np.random.random(chromosome.shape) < prob_mutation
+    cauchy = np.random.standard_cauchy(size=chromosome.shape) * scale
+    chromosome[mutation_array] += cauchy[mutation_array]
 
 def exponential_mutation(chromosome: np.ndarray, xi: Union[float, np.ndarray], prob_mutation: float) -> None:
     mutation_array = np.random.random(chromosome.shape) < prob_mutation
@@ -85,10 +90,9 @@ def exponential_mutation(chromosome: np.ndarray, xi: Union[float, np.ndarray], p
     chromosome[mutation_array] += delta[mutation_array]
 
 def mmo_mutation(chromosome: np.ndarray, prob_mutation: float) -> None:
-    from scipy import stats
     mutation_array = np.random.random(chromosome.shape) < prob_mutation
     normal = np.random.normal(size=chromosome.shape)  # Eq 11.21
-    cauchy = stats.cauchy.rvs(size=chromosome.shape)  # Eq 11.22
+    cauchy = np.random.standard_cauchy(size=chromosome.shape)  # Eq 11.22
     
     # Eq 11.20
     delta = np.empty(chromosome.shape)
@@ -0,0 +1,163 @@
+"""
+In-place crossover and mutation kernels and the registry that picks them from the config.
+
+The functions in crossover.py and mutation.py build a boolean mask over every gene and index with it several times,
+which allocates a handful of temporaries the size of the chromosome per call. These kernels write the children into
+preallocated arrays and only draw random numbers for the genes that actually mutate. Since the gaps between
+Bernoulli(prob_mutation) successes are geometric, the mutated genes can be found without a mask over every gene.
+
+All kernels expect C-contiguous arrays, which is what next_generation creates.
+"""
+from functools import partial
+from typing import Any, Callable, Dict
+import math
+import numpy as np
+
+
+CrossoverKernel = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], None]
+MutationKernel = Callable[[np.ndarray, float], None]
+
+
+def mutation_indices(size: int, prob_mutation: float) -> np.ndarray:
+    """
+    Flat indices of the genes that mutate when each of size genes mutates with probability prob_mutation
+    """
+    if prob_mutation <= 0 or size == 0:
+        return np.empty(0, np.int64)
+    if prob_mutation >= 1:
+        return np.arange(size)
+    expected = size * prob_mutation
+    # Enough gaps to reach the end almost always. If not, keep drawing
+    num_gaps = int(expected + 4 * math.sqrt(expected) + 16)
+    positions = np.cumsum(np.random.geometric(prob_mutation, size=num_gaps)) - 1
+    while positions[-1] < size:
+        more = np.cumsum(np.random.geometric(prob_mutation, size=num_gaps)) + positions[-1]
+        positions = np.concatenate((positions, more))
+    return positions[:np.searchsorted(positions, size)]
+
+
+# Crossover. Each takes parent1, parent2 and writes the children into out1, out2
+
+def sbx_crossover(parent1: np.ndarray, parent2: np.ndarray, out1: np.ndarray, out2: np.ndarray, eta: float) -> None:
+    """
+    Same distribution as simulated_binary_crossover.
+    The children are the mean of the parents -/+ gamma times half their difference.
+    """
+    gamma = np.random.random(parent1.shape)
+    # (2u)^(1/(eta+1)) for u <= 0.5 and (1/(2 - 2u))^(1/(eta+1)) otherwise
+    upper = gamma > 0.5
+    gamma *= 2
+    np.subtract(2, gamma, out=gamma, where=upper)
+    np.reciprocal(gamma, out=gamma, where=upper)
+    np.power(gamma, 1.0 / (eta + 1), out=gamma)
+
+    np.subtract(parent1, parent2, out=out2)
+    out2 *= gamma
+    out2 *= 0.5
+    np.add(parent1, parent2, out=out1)
+    out1 *= 0.5
+    # gamma is free again, use it for child 2
+    np.subtract(out1, out2, out=gamma)
+    out1 += out2
+    np.copyto(out2, gamma)
+
+
+def uniform_crossover(parent1: np.ndarray, parent2: np.ndarray, out1: np.ndarray, out2: np.ndarray) -> None:
+    """
+    Same as uniform_binary_crossover. Each gene is swapped with probability 0.5
+    """
+    swap = np.random.random(parent1.shape) > 0.5
+    np.copyto(out1, parent1)
+    np.copyto(out1, parent2, where=swap)
+    np.copyto(out2, parent2)
+    np.copyto(out2, parent1, where=swap)
+
+
+def single_point_crossover(parent1: np.ndarray, parent2: np.ndarray, out1: np.ndarray, out2: np.ndarray) -> None:
+    """
+    Same as single_point_binary_crossover with major='r'. Everything up to and including a random gene
+    (in row-major order) is swapped.
+    """
+    point = np.random.randint(0, parent1.size) + 1
+    flat1, flat2 = out1.reshape(-1), out2.reshape(-1)
+    flat1[:point] = parent2.reshape(-1)[:point]
+    flat1[point:] = parent1.reshape(-1)[point:]
+    flat2[:point] = parent1.reshape(-1)[:point]
+    flat2[point:] = parent2.reshape(-1)[point:]
+
+
+# Mutation. Each changes the chromosome in place
+
+def gaussian_mutation(chromosome: np.ndarray, prob_mutation: float, scale: float = 1.0) -> None:
+    flat = chromosome.reshape(-1)
+    indices = mutation_indices(flat.size, prob_mutation)
+    flat[indices] += np.random.normal(0, scale, size=len(indices))
+
+
+def uniform_mutation(chromosome: np.ndarray, prob_mutation: float, low: float = -1.0, high: float = 1.0) -> None:
+    """
+    Same as random_uniform_mutation. Mutated genes get a new value in [low, high)
+    """
+    flat = chromosome.reshape(-1)
+    indices = mutation_indices(flat.size, prob_mutation)
+    flat[indices] = np.random.uniform(low, high, size=len(indices))
+
+
+def cauchy_mutation(chromosome: np.ndarray, prob_mutation: float, scale: float = 1.0) -> None:
+    """
+    Like gaussian_mutation but with the heavier tailed Cauchy(0, scale), so some mutations are large jumps
+    """
+    flat = chromosome.reshape(-1)
+    indices = mutation_indices(flat.size, prob_mutation)
+    flat[indices] += np.random.standard_cauchy(size=len(indices)) * scale
+
+
+def exponential_mutation(chromosome: np.ndarray, prob_mutation: float, scale: float = 1.0) -> None:
+    """
+    Eq 11.17, the two sided exponential (Laplace) distribution with mean 0 and scale 1 / xi
+    """
+    flat = chromosome.reshape(-1)
+    indices = mutation_indices(flat.size, prob_mutation)
+    flat[indices] += np.random.laplace(0, scale, size=len(indices))
+
+
+def mmo_mutation(chromosome: np.ndarray, prob_mutation: float, scale: float = 1.0) -> None:
+    """
+    Eq 11.20, the sum of a N(0, 1) and a Cauchy(0, 1) value, times scale
+    """
+    flat = chromosome.reshape(-1)
+    indices = mutation_indices(flat.size, prob_mutation)
+    delta = np.random.normal(size=len(indices))
+    delta += np.random.standard_cauchy(size=len(indices))
+    delta *= scale
+    flat[indices] += delta
+
+
+# The registry maps the name in settings.config to a function that binds the kernel's parameters from the config
+CROSSOVERS: Dict[str, Callable[[Any], CrossoverKernel]] = {
+    'sbx': lambda config: partial(sbx_crossover, eta=config.Crossover.sbx_eta),
+    'uniform': lambda config: uniform_crossover,
+    'single_point': lambda config: single_point_crossover,
+}
+
+MUTATIONS: Dict[str, Callable[[Any], MutationKernel]] = {
+    'gaussian': lambda config: partial(gaussian_mutation, scale=config.Mutation.gaussian_mutation_scale),
+    'uniform': lambda config: uniform_mutation,
+    'cauchy': lambda config: partial(cauchy_mutation, scale=config.Mutation.gaussian_mutation_scale),
+    'exponential': lambda config: partial(exponential_mutation, scale=config.Mutation.gaussian_mutation_scale),
+    'mmo': lambda config: partial(mmo_mutation, scale=config.Mutation.gaussian_mutation_scale),
+}
+
+
+def get_crossover(config: Any) -> CrossoverKernel:
+    crossover_type = config.Crossover.crossover_type
+    if crossover_type not in CROSSOVERS:
+        raise Exception('crossover_type "{}" is not supported. Options are ({})'.format(crossover_type, ', '.join(CROSSOVERS)))
+    return CROSSOVERS[crossover_type](config)
+
+
+def get_mutation(config: Any) -> MutationKernel:
+    mutation_type = config.Mutation.mutation_type
+    if mutation_type not in MUTATIONS:
+        raise Exception('mutation_type "{}" is not supported. Options are ({})'.format(mutation_type, ', '.join(MUTATIONS)))
+    return MUTATIONS[mutation_type](config)
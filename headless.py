@@ -0,0 +1,363 @@
+"""
+Training and replaying without a display.
+
+Nothing here imports Qt, so `python smb_ai.py --no-display ...` (or `python headless.py ...` with the same options)
+only loads NumPy, the config, Mario and the emulator. The GA steps are the same as the ones MainWindow in gui.py
+runs, which uses the helpers here for loading individuals and finishing a generation.
+"""
+import os
+import sys
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from config import Config
+from death_map import DeathMap
+from emulator import make_env
+from es import EvolutionStrategy
+from evaluation import run_individual
+from generation import next_generation
+from genetic_algorithm.individual import Individual
+from genetic_algorithm.population import Population
+from mario import Mario, save_mario, save_stats, load_mario
+from metrics import TrainingMetrics, MetricsServer
+from multilevel import MultiLevelEvaluator, get_levels
+from novelty import NoveltyArchive
+from racing import get_budgets, evaluate_racing
+from steady_state import SteadyStateGA
+from surrogate import Surrogate
+from trajectory_store import TrajectoryStore
+import profiling
+
+
+def load_initial_population(args: Any, config: Optional[Config]) -> Tuple[Config, Population, int]:
+    """
+    Create the first population from the command line options: individuals from --load-file/--load-inds,
+    --replay-file/--replay-inds, or new ones. If no config is given, the one saved with the individuals is used.
+    Returns (config, population, current_generation).
+    """
+    current_generation = 0
+    individuals: List[Individual] = []
+
+    # Load any individuals listed in the args.load_inds
+    num_loaded = 0
+    if args.load_inds:
+        # Overwrite the config file IF one is not specified
+        if not config:
+            try:
+                config = Config(os.path.join(args.load_file, 'settings.config'))
+            except:
+                raise Exception(f'settings.config not found under {args.load_file}')
+
+        set_of_inds = set(args.load_inds)
+
+        for ind_name in os.listdir(args.load_file):
+            if ind_name.startswith('best_ind_gen'):
+                ind_number = int(ind_name[len('best_ind_gen'):])
+                if ind_number in set_of_inds:
+                    individual = load_mario(args.load_file, ind_name, config)
+                    # Set debug stuff if needed
+                    if args.debug:
+                        individual.name = f'm{num_loaded}_loaded'
+                        individual.debug = True
+                    individuals.append(individual)
+                    num_loaded += 1
+
+        # Set the generation
+        current_generation = max(set_of_inds) + 1  # +1 becauase it's the next generation
+
+    # Load any individuals listed in args.replay_inds
+    if args.replay_inds:
+        # Overwrite the config file IF one is not specified
+        if not config:
+            try:
+                config = Config(os.path.join(args.replay_file, 'settings.config'))
+            except:
+                raise Exception(f'settings.config not found under {args.replay_file}')
+
+        for ind_gen in args.replay_inds:
+            ind_name = f'best_ind_gen{ind_gen}'
+            fname = os.path.join(args.replay_file, ind_name)
+            if os.path.exists(fname):
+                individual = load_mario(args.replay_file, ind_name, config)
+                # Set debug stuff if needed
+                if args.debug:
+                    individual.name= f'm_gen{ind_gen}_replay'
+                    individual.debug = True
+                individuals.append(individual)
+            else:
+                raise Exception(f'No individual named {ind_name} under {args.replay_file}')
+    # If it's not a replay then we need to continue creating individuals
+    else:
+        num_parents = max(config.Selection.num_parents - num_loaded, 0)
+        for _ in range(num_parents):
+            individual = Mario(config)
+            # Set debug stuff if needed
+            if args.debug:
+                individual.name = f'm{num_loaded}'
+                individual.debug = True
+            individuals.append(individual)
+            num_loaded += 1
+
+    return config, Population(individuals), current_generation
+
+
+def start_metrics(port: Optional[int], generation: int, debug: bool) -> Optional[TrainingMetrics]:
+    if not port:
+        return None
+    metrics = TrainingMetrics()
+    metrics.generation = generation
+    server = MetricsServer(metrics, port)
+    server.start()
+    if debug:
+        print('Serving metrics on http://{}:{}/metrics'.format(*server.address))
+    return metrics
+
+
+def report_generation(population: Population, config: Config, current_generation: int, true_zero_gen: int = 0,
+                      metrics: Optional[TrainingMetrics] = None, debug: bool = False,
+                      surrogate: Optional[Surrogate] = None, death_map: Optional[DeathMap] = None) -> None:
+    """
+    Report and save the generation that was just evaluated (current_generation - 1).
+    With a surrogate the stats and death map only cover the individuals that were emulated.
+    """
+    if debug:
+        print(f'----Current Gen: {current_generation}, True Zero: {true_zero_gen}')
+        fittest = population.fittest_individual
+        print(f'Best fitness of gen: {fittest.fitness}, Max dist of gen: {fittest.farthest_x}')
+        num_wins = sum(individual.did_win for individual in population.individuals)
+        pop_size = len(population.individuals)
+        print(f'Wins: {num_wins}/{pop_size} (~{(float(num_wins)/pop_size*100):.2f}%)')
+        if surrogate:
+            print(f'Surrogate: {surrogate.num_predicted}/{pop_size} predicted, audit rank correlation: {surrogate.audit_correlation}')
+
+    if metrics:
+        individuals = population.individuals
+        metrics.generation_finished(current_generation,
+                                    [individual.fitness for individual in individuals],
+                                    [individual.farthest_x for individual in individuals],
+                                    sum(individual.did_win for individual in individuals))
+
+    prof = profiling.profiler
+    if config.Statistics.save_best_individual_from_generation:
+        t = prof.start()
+        folder = config.Statistics.save_best_individual_from_generation
+        best_ind_name = 'best_ind_gen{}'.format(current_generation - 1)
+        best_ind = population.fittest_individual
+        save_mario(folder, best_ind_name, best_ind)
+        prof.stop('save_mario', t)
+
+    if config.Statistics.save_population_stats:
+        t = prof.start()
+        fname = config.Statistics.save_population_stats
+        save_stats(Population(surrogate.emulated()) if surrogate else population, fname)
+        prof.stop('save_stats', t)
+
+    if death_map:
+        death_map.add(config.Misc.level, surrogate.emulated() if surrogate else population.individuals)
+        death_map.save()
+
+
+def report_profile(config: Config, current_generation: int, debug: bool = False) -> None:
+    """
+    Write (or print with debug) the profiling summary of the generation that was just evaluated and reset it
+    """
+    prof = profiling.profiler
+    if prof.enabled:
+        # The summary covers the generation that was just evaluated, which is current_generation - 1
+        if config.Statistics.save_population_stats:
+            fname = profiling.get_profile_filename(config.Statistics.save_population_stats)
+            summary = prof.write_summary(fname, current_generation - 1)
+        else:
+            summary = prof.summary()
+            prof.reset()
+        if debug:
+            print(prof.format_summary(summary))
+
+
+def finish_generation(population: Population, config: Config, current_generation: int, true_zero_gen: int = 0,
+                      metrics: Optional[TrainingMetrics] = None, debug: bool = False,
+                      novelty: Optional[NoveltyArchive] = None, es: Optional[EvolutionStrategy] = None,
+                      surrogate: Optional[Surrogate] = None, death_map: Optional[DeathMap] = None) -> List[Mario]:
+    """
+    Report and save the generation that was just evaluated (current_generation - 1) and return the next one,
+    created by the GA or by es if given.
+    The stats are saved before novelty (if any) replaces the fitness used for selection.
+    """
+    report_generation(population, config, current_generation, true_zero_gen, metrics, debug, surrogate, death_map)
+
+    prof = profiling.profiler
+    t = prof.start()
+    if es:
+        individuals = es.next_generation(population, current_generation, debug, novelty)
+    else:
+        individuals = next_generation(population, config, current_generation, debug, novelty)
+    prof.stop('next_generation', t)
+
+    report_profile(config, current_generation, debug)
+    return individuals
+
+
+def run_steady_state(ga: SteadyStateGA, args: Any, config: Config, pool: Any, env: Any, true_zero_gen: int = 0,
+                     metrics: Optional[TrainingMetrics] = None, death_map: Optional[DeathMap] = None,
+                     trajectories: Optional[TrajectoryStore] = None) -> None:
+    """
+    Evaluate the individuals of a steady-state GA with the pool, or one at a time with env, until interrupted.
+    Every num_offspring evaluations are reported and saved like a generation.
+    """
+    max_distance = 0
+    start, busy_s = time.perf_counter(), pool.busy_s if pool else 0.0
+
+    def tell(individual: Mario) -> None:
+        nonlocal max_distance, start, busy_s
+        if metrics:
+            metrics.individual_finished(individual._frames, individual.fitness, individual.farthest_x, individual.did_win)
+        if individual.farthest_x > max_distance:
+            if args.debug:
+                print('New farthest distance:', individual.farthest_x)
+            max_distance = individual.farthest_x
+
+        told = ga.tell(individual)
+        if told is None:
+            return
+        if trajectories:
+            trajectories.end_generation(ga.current_generation - 1)
+        report_generation(Population(told), config, ga.current_generation, true_zero_gen, metrics, args.debug,
+                          death_map=death_map)
+        if pool and args.debug:
+            now = time.perf_counter()
+            utilization = (pool.busy_s - busy_s) / ((now - start) * pool.num_workers)
+            print(f'Worker utilization: {utilization:.1%}')
+            start, busy_s = now, pool.busy_s
+        report_profile(config, ga.current_generation, args.debug)
+
+    if pool:
+        pool.evaluate_steady(ga.ask, tell)
+    else:
+        while True:
+            individual = ga.ask()
+            run_individual(env, individual, record_actions=args.record_actions, trajectories=trajectories)
+            tell(individual)
+
+
+def run_headless(args: Any, config: Optional[Config] = None, env_factory: Callable[[str], Any] = None) -> None:
+    """
+    The same GA as MainWindow, but as a plain loop instead of a timer callback per frame.
+    With --processes N the individuals are evaluated by N workers forked from a pre-warmed template (see forkserver.py).
+    With [Surrogate] enabled only the individuals it selects are emulated (see surrogate.py).
+    With [Racing] enabled individuals are evaluated by successive halving (see racing.py).
+    With [Trajectories] enabled every frame of every generation is saved (see trajectory_store.py).
+    With [SteadyState] enabled there are no generations to wait for (see steady_state.py).
+    With several [MultiLevel] levels each individual is evaluated on all of them by --processes (at least one)
+    processes per level (see multilevel.py). Replays only play [Misc] level.
+    Replays return once every individual has run. Otherwise this runs until interrupted.
+    """
+    config, population, current_generation = load_initial_population(args, config)
+    # If you load individuals then you might start at gen 12, in which case gen 12 would be the true 0
+    true_zero_gen = current_generation
+    metrics = start_metrics(args.metrics_port, current_generation, args.debug)
+    novelty = NoveltyArchive.from_config(config)
+    es = EvolutionStrategy.from_config(config)
+    death_map = DeathMap.from_config(config)
+    # Replays always run every individual
+    surrogate = None if args.replay_file else Surrogate.from_config(config)
+    if surrogate and novelty:
+        raise Exception('[Surrogate] and [Novelty] can not be used together since predicted individuals have no behavior')
+
+    budgets = get_budgets(config) if config.Racing.enabled else None
+    trajectories = None if args.replay_file else TrajectoryStore.from_config(config)
+    steady = None if args.replay_file else SteadyStateGA.from_config(config, population.individuals, current_generation)
+
+    levels = get_levels(config)
+    pool, env, evaluator = None, None, None
+    if len(levels) > 1 and not args.replay_file:
+        if budgets:
+            raise Exception('[MultiLevel] does not support [Racing] since the level workers run individuals to the end')
+        if novelty:
+            raise Exception('[MultiLevel] does not support [Novelty] since the level workers only send back results')
+        if trajectories:
+            raise Exception('[MultiLevel] does not support [Trajectories] since the level workers only send back results')
+        if steady:
+            raise Exception('[MultiLevel] does not support [SteadyState]')
+        if args.record_actions:
+            raise Exception('--record-actions does not support [MultiLevel] since the level workers only send back results')
+        evaluator = MultiLevelEvaluator(config, levels, num_workers=max(args.processes, 1), env_factory=env_factory)
+    elif args.processes > 1:
+        if budgets:
+            raise Exception('--processes does not support [Racing] since the ranking needs the whole generation')
+        if novelty:
+            raise Exception('--processes does not support [Novelty] since workers only send back results')
+        if trajectories:
+            raise Exception('--processes does not support [Trajectories] since workers only send back results')
+        from forkserver import ForkServerPool
+        pool = ForkServerPool(config, num_workers=args.processes, max_jobs=args.max_worker_jobs, env_factory=env_factory)
+    else:
+        env_factory = env_factory or (lambda level: make_env(level, ram_only=True))
+        env = env_factory(config.Misc.level)
+
+    max_distance = 0
+    try:
+        if steady:
+            run_steady_state(steady, args, config, pool, env, true_zero_gen, metrics, death_map, trajectories)
+            return
+
+        while True:
+            evaluated = surrogate.select(population.individuals) if surrogate else population.individuals
+            start, busy_s = time.perf_counter(), pool.busy_s if pool else 0.0
+            if evaluator:
+                evaluator.evaluate(Population(evaluated))
+                if death_map:
+                    for l, level in enumerate(levels):
+                        death_map.add_results(level, evaluator.results[:, l])
+            elif pool:
+                pool.evaluate(Population(evaluated))
+                if args.debug:
+                    utilization = (pool.busy_s - busy_s) / ((time.perf_counter() - start) * pool.num_workers)
+                    print(f'Worker utilization: {utilization:.1%}')
+            elif budgets and not args.replay_file:
+                evaluate_racing(env, evaluated, budgets, config.Racing.keep_fraction, args.record_actions, args.debug,
+                                trajectories)
+            else:
+                for individual in evaluated:
+                    run_individual(env, individual, record_actions=args.record_actions, trajectories=trajectories)
+            if surrogate:
+                surrogate.finish()
+
+            for individual in evaluated:
+                if metrics:
+                    metrics.individual_finished(individual._frames, individual.fitness, individual.farthest_x, individual.did_win)
+                if individual.farthest_x > max_distance:
+                    if args.debug:
+                        print('New farthest distance:', individual.farthest_x)
+                    max_distance = individual.farthest_x
+
+            if args.replay_file:
+                if args.debug:
+                    print(f'Finished replaying {len(args.replay_inds)} best individuals')
+                return
+
+            if trajectories:
+                trajectories.end_generation(current_generation)
+            current_generation += 1
+            # The level results were already added to the death map, finish_generation would add them to [Misc] level
+            population.individuals = finish_generation(population, config, current_generation, true_zero_gen, metrics, args.debug,
+                                                       novelty, es, surrogate, None if evaluator else death_map)
+            if evaluator and death_map:
+                death_map.save()
+    finally:
+        if trajectories:
+            trajectories.close()
+        if evaluator:
+            evaluator.close()
+        elif pool:
+            pool.close()
+        else:
+            env.close()
+
+if __name__ == '__main__':
+    from smb_ai import parse_args
+    args = parse_args()
+    if args.profile:
+        profiling.enable_profiling()
+    config = Config(args.config) if args.config else None
+    run_headless(args, config)
+    sys.exit(0)
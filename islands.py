@@ -0,0 +1,241 @@
+"""
+Island model GA.
+
+Each island is its own process running the usual evaluate -> select -> crossover -> mutate loop on its own population,
+sized by [Selection]. Every `migration_interval` generations an island sends copies of its best `num_migrants`
+individuals to another island as a flat (num_migrants, num_genes) array, along with their fitness and with [Novelty]
+their behavior. Islands never wait on each other. Migrants are picked up whenever the receiving island reaches its own
+migration point and replace its worst individuals.
+
+Usage:
+    python islands.py -c settings.config [--generations 1000] [--debug] [--metrics-port 8000]
+The island settings are under [Islands] in the config.
+"""
+import argparse
+import os
+import queue
+import random
+import sys
+import time
+import multiprocessing as mp
+from typing import Any, Callable, List, Optional
+import numpy as np
+
+from config import Config
+from death_map import DeathMap
+from emulator import make_env
+from evaluation import evaluate_population
+from generation import next_generation
+from genetic_algorithm.population import Population
+from mario import Mario, save_mario, save_stats
+from metrics import TrainingMetrics, MetricsServer
+from multilevel import MultiLevelEvaluator, get_levels
+from neural_network import flatten_params, unflatten_params
+from novelty import NoveltyArchive
+from racing import get_budgets, evaluate_racing
+from surrogate import Surrogate
+
+
+def get_island_filename(fname: str, island_id: int) -> str:
+    """
+    Per island version of a stats file, i.e. /path/stats.csv -> /path/stats_island0.csv
+    """
+    root, ext = os.path.splitext(fname)
+    return f'{root}_island{island_id}{ext}'
+
+
+def get_destination(island_id: int, num_islands: int, topology: str) -> int:
+    if topology == 'ring':
+        return (island_id + 1) % num_islands
+    elif topology == 'random':
+        return random.choice([i for i in range(num_islands) if i != island_id])
+    raise Exception(f'Unknown island topology "{topology}"')
+
+
+def _receive_migrants(population: Population, inbox: Any, config: Config) -> int:
+    """
+    Replace the worst individuals with any migrants that have arrived. Returns the number of migrants received.
+    """
+    num_received = 0
+    while True:
+        try:
+            genomes, fitnesses, behaviors = inbox.get_nowait()
+        except queue.Empty:
+            return num_received
+
+        # Worst individuals go first
+        population.individuals.sort(key=lambda individual: individual.fitness)
+        layer_nodes = population.individuals[0].network.layer_nodes
+        for i, (genome, fitness, (location, trajectory)) in enumerate(zip(genomes, fitnesses, behaviors)):
+            if i >= len(population.individuals):
+                break
+            migrant = Mario(config, unflatten_params(genome, layer_nodes))
+            # The migrant was evaluated on the same level with the same fitness function, so the fitness carries over
+            migrant._fitness = float(fitness)
+            # Novelty search scores the migrant on where it went, which it can't know without being run here
+            migrant.location = location
+            migrant.trajectory = trajectory
+            population.individuals[i] = migrant
+            num_received += 1
+
+
+def _send_migrants(population: Population, outbox: Any, num_migrants: int) -> None:
+    best = sorted(population.individuals, key=lambda individual: individual.fitness, reverse=True)[:num_migrants]
+    layer_nodes = best[0].network.layer_nodes
+    genomes = np.stack([flatten_params(individual.network.params, layer_nodes) for individual in best])
+    fitnesses = np.array([individual.fitness for individual in best])
+    # trajectory is None without [Novelty]
+    behaviors = [(individual.location, individual.trajectory) for individual in best]
+    outbox.put((genomes, fitnesses, behaviors))
+
+
+def run_island(island_id: int, config_filename: str, inboxes: List[Any], reports: Any,
+               generations: Optional[int], seed: int, debug: bool,
+               env_factory: Callable[[str], Any] = None) -> None:
+    # Migrants that never get read shouldn't keep this process from exiting
+    for inbox in inboxes:
+        inbox.cancel_join_thread()
+
+    np.random.seed(seed)
+    random.seed(seed)
+    config = Config(config_filename)
+    num_islands = len(inboxes)
+    levels = get_levels(config)
+    # With several levels each island gets its own processes, one per level
+    if len(levels) > 1:
+        evaluator = MultiLevelEvaluator(config, levels, env_factory=env_factory)
+        env = None
+    else:
+        env_factory = env_factory or (lambda level: make_env(level, ram_only=True))
+        env = env_factory(levels[0])
+
+    if config.GeneticAlgorithm.optimizer != 'ga':
+        raise Exception('islands.py only supports the GA optimizer')
+    if config.SteadyState.enabled:
+        raise Exception('islands.py does not support [SteadyState]')
+    novelty = NoveltyArchive.from_config(config)
+    if novelty and env is None:
+        raise Exception('[Novelty] needs a single level since the level workers only send back results')
+    surrogate = Surrogate.from_config(config)
+    budgets = get_budgets(config) if config.Racing.enabled else None
+    if budgets and env is None:
+        raise Exception('[Racing] needs a single level since the level workers run individuals to the end')
+    if config.Trajectories.enabled:
+        raise Exception('[Trajectories] is only supported by headless.py')
+    death_map = None
+    if config.DeathMap.enabled:
+        death_map = DeathMap.from_config(config, get_island_filename(config.DeathMap.file, island_id))
+    if surrogate and novelty:
+        raise Exception('[Surrogate] and [Novelty] can not be used together since predicted individuals have no behavior')
+
+    population = Population([Mario(config) for _ in range(config.Selection.num_parents)])
+    generation = 0
+    while generations is None or generation < generations:
+        # Reports and stats only cover the individuals that were emulated
+        evaluated = Population(surrogate.select(population.individuals)) if surrogate else population
+        if env is None:
+            frames = evaluator.evaluate(evaluated)
+        elif budgets:
+            frames = evaluate_racing(env, evaluated.individuals, budgets, config.Racing.keep_fraction)
+        else:
+            frames = evaluate_population(env, evaluated)
+        if surrogate:
+            surrogate.finish()
+        if death_map:
+            if env is None:
+                for l, level in enumerate(levels):
+                    death_map.add_results(level, evaluator.results[:, l])
+            else:
+                death_map.add(levels[0], evaluated.individuals)
+            death_map.save()
+
+        wins = sum(individual.did_win for individual in evaluated.individuals)
+        fitnesses = [individual.fitness for individual in evaluated.individuals]
+        distances = [individual.farthest_x for individual in evaluated.individuals]
+        reports.put((island_id, generation, frames, len(fitnesses), wins, fitnesses, distances))
+
+        if config.Statistics.save_best_individual_from_generation:
+            folder = os.path.join(config.Statistics.save_best_individual_from_generation, f'island{island_id}')
+            save_mario(folder, f'best_ind_gen{generation}', population.fittest_individual)
+
+        if config.Statistics.save_population_stats:
+            save_stats(evaluated, get_island_filename(config.Statistics.save_population_stats, island_id))
+
+        if config.Islands.num_islands > 1 and generation > 0 and generation % config.Islands.migration_interval == 0:
+            num_received = _receive_migrants(population, inboxes[island_id], config)
+            destination = get_destination(island_id, num_islands, config.Islands.topology)
+            _send_migrants(population, inboxes[destination], config.Islands.num_migrants)
+            if debug:
+                print(f'[island {island_id}] gen {generation}: received {num_received} migrants, sent {config.Islands.num_migrants} to island {destination}')
+
+        generation += 1
+        population.individuals = next_generation(population, config, generation, novelty=novelty)
+
+    if env is None:
+        evaluator.close()
+    else:
+        env.close()
+
+
+def run_islands(config: Config, generations: Optional[int] = None, seed: Optional[int] = None,
+                debug: bool = False, metrics: Optional[TrainingMetrics] = None,
+                env_factory: Callable[[str], Any] = None) -> None:
+    num_islands = config.Islands.num_islands
+    seed = seed if seed is not None else int(time.time())
+
+    inboxes = [mp.Queue() for _ in range(num_islands)]
+    reports = mp.Queue()
+    processes = []
+    for island_id in range(num_islands):
+        p = mp.Process(target=run_island, name=f'island{island_id}',
+                       args=(island_id, config.filename, inboxes, reports, generations, seed + island_id, debug, env_factory))
+        p.start()
+        processes.append(p)
+
+    best_fitness = 0.0
+    max_distance = 0
+    try:
+        while any(p.is_alive() for p in processes) or not reports.empty():
+            try:
+                island_id, generation, frames, num_individuals, wins, fitnesses, distances = reports.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            best_fitness = max(best_fitness, max(fitnesses))
+            max_distance = max(max_distance, max(distances))
+            if metrics:
+                metrics.individuals_finished(frames, num_individuals, wins, max(fitnesses), max(distances))
+                metrics.generation_finished(generation, fitnesses, distances, wins)
+            if debug:
+                print(f'[island {island_id}] gen {generation}: best fitness {max(fitnesses):.2f}, '
+                      f'mean fitness {np.mean(fitnesses):.2f}, max dist {max(distances)}, wins {wins}/{num_individuals} '
+                      f'(overall best fitness {best_fitness:.2f}, max dist {max_distance})')
+    except KeyboardInterrupt:
+        for p in processes:
+            p.terminate()
+    finally:
+        for p in processes:
+            p.join()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Super Mario Bros AI island model GA')
+    parser.add_argument('-c', '--config', dest='config', required=True, help='config file to use')
+    parser.add_argument('--generations', dest='generations', type=int, default=None, help='Number of generations each island runs for. Runs forever if not set')
+    parser.add_argument('--seed', dest='seed', type=int, default=None, help='Island i is seeded with seed + i')
+    parser.add_argument('--debug', dest='debug', required=False, default=False, action='store_true', help='If set, per island progress is printed')
+    parser.add_argument('--metrics-port', dest='metrics_port', required=False, type=int, default=None, help='If set, serve live training metrics as Prometheus text on http://127.0.0.1:<port>/metrics')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    config = Config(args.config)
+
+    metrics = None
+    if args.metrics_port:
+        metrics = TrainingMetrics()
+        MetricsServer(metrics, args.metrics_port).start()
+
+    run_islands(config, args.generations, args.seed, args.debug, metrics)
+    sys.exit(0)
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import numpy as np
 from typing import Tuple, Optional, Union, Set, Dict, Any, List
 import random
@@ -9,10 +10,27 @@ from genetic_algorithm.population import Population
 from neural_network import FeedForwardNetwork, linear, sigmoid, tanh, relu, leaky_relu, ActivationFunction, get_activation_by_name
 from utils import SMB, StaticTileType, EnemyType
 from config import Config
+import profiling
+
+
+# Why Mario.update stopped a run. 'running' means it was stopped from outside, i.e. by max_frames or racing
+DEATH_CAUSES = ('running', 'enemy', 'hole', 'stall', 'flag', 'win_timeout')
+CAUSE_RUNNING, CAUSE_ENEMY, CAUSE_HOLE, CAUSE_STALL, CAUSE_FLAG, CAUSE_WIN_TIMEOUT = range(len(DEATH_CAUSES))
 
 
 
 class Mario(Individual):
+    # Thousands of these are created every generation, so there is no per instance __dict__.
+    # level_fitness, novelty and objective_fitness are None unless set by multi-level evaluation or novelty search
+    __slots__ = ('config', 'lifespan', 'name', 'debug', '_fitness', '_frames_since_progress', '_frames',
+                 'hidden_layer_architecture', 'hidden_activation', 'output_activation',
+                 'start_row', 'viz_width', 'viz_height', 'inputs_as_array', 'network_architecture', 'network',
+                 'is_alive', 'death_cause', 'x_dist', 'game_score', 'did_win', 'action_log', 'location', 'trajectory',
+                 '_trajectory_interval', 'allow_additional_time', 'additional_timesteps', '_printed',
+                 'buttons_to_press', 'farthest_x', '_memo', '_memo_size', 'level_fitness', 'novelty', 'objective_fitness')
+
+    max_additional_timesteps = int(60*2.5)
+
     def __init__(self,
                  config: Config,
                  chromosome: Optional[Dict[str, np.ndarray]] = None,
@@ -53,21 +71,26 @@ class Mario(Individual):
 
         self.network = FeedForwardNetwork(self.network_architecture,
                                           get_activation_by_name(self.hidden_activation),
-                                          get_activation_by_name(self.output_activation)
+                                          get_activation_by_name(self.output_activation),
+                                          # If chromosome is set, take it instead of initializing new weights
+                                          params=chromosome
                                          )
-
-        # If chromosome is set, take it
-        if chromosome:
-            self.network.params = chromosome
         
         self.is_alive = True
+        self.death_cause = CAUSE_RUNNING  # Index into DEATH_CAUSES
         self.x_dist = None
         self.game_score = None
         self.did_win = False
+        self.action_log = None  # Set when the buttons pressed each frame are being recorded
+        self.location = None  # Latest (x, y) in the level
+        # Positions sampled every trajectory_interval frames. Only kept for novelty search
+        self.trajectory = None
+        if self.config.Novelty.mode != 'off':
+            self.trajectory = []
+            self._trajectory_interval = self.config.Novelty.trajectory_interval
         # This is mainly just to "see" Mario winning
         self.allow_additional_time  = self.config.Misc.allow_additional_time_for_flagpole
         self.additional_timesteps = 0
-        self.max_additional_timesteps = int(60*2.5)
         self._printed = False
 
         # Keys correspond with             B, NULL, SELECT, START, U, D, L, R, A
@@ -75,6 +98,15 @@ class Mario(Individual):
         self.buttons_to_press = np.array( [0, 0,    0,      0,     0, 0, 0, 0, 0], np.int8)
         self.farthest_x = 0
 
+        # Encoded inputs -> (network output, buttons_to_press, activations of every layer) of the last _memo_size
+        # distinct inputs, oldest first. The activations are restored too since the network views draw them
+        self._memo_size = self.config.NeuralNetwork.forward_memo_size
+        self._memo = OrderedDict() if self._memo_size > 0 else None
+
+        self.level_fitness = None  # Fitness on each level, set by multi-level evaluation
+        self.novelty = None  # Set by novelty search
+        self.objective_fitness = None  # Fitness from fitness_func when novelty search replaced it for selection
+
 
     @property
     def fitness(self):
@@ -137,7 +169,10 @@ class Mario(Individual):
         """
         if self.is_alive:
             self._frames += 1
-            self.x_dist = SMB.get_mario_location_in_level(ram).x
+            self.location = SMB.get_mario_location_in_level(ram)
+            self.x_dist = self.location.x
+            if self.trajectory is not None and (self._frames - 1) % self._trajectory_interval == 0:
+                self.trajectory.append(self.location)
             self.game_score = SMB.get_mario_score(ram)
             # Sliding down flag pole
             if ram[0x001D] == 3:
@@ -149,6 +184,7 @@ class Mario(Individual):
                     self._printed = True
                 if not self.allow_additional_time:
                     self.is_alive = False
+                    self.death_cause = CAUSE_FLAG
                     return False
             # If we made it further, reset stats
             if self.x_dist > self.farthest_x:
@@ -162,22 +198,49 @@ class Mario(Individual):
             
             if self.allow_additional_time and self.additional_timesteps > self.max_additional_timesteps:
                 self.is_alive = False
+                self.death_cause = CAUSE_WIN_TIMEOUT
                 return False
             elif not self.did_win and self._frames_since_progress > 60*3:
                 self.is_alive = False
+                self.death_cause = CAUSE_STALL
                 return False            
         else:
             return False
 
         # Did you fly into a hole?
-        if ram[0x0E] in (0x0B, 0x06) or ram[0xB5] == 2:
+        if ram[0xB5] == 2:
+            self.is_alive = False
+            self.death_cause = CAUSE_HOLE
+            return False
+        # Or get killed (dying or player dies)
+        if ram[0x0E] in (0x0B, 0x06):
             self.is_alive = False
+            self.death_cause = CAUSE_ENEMY
             return False
 
+        prof = profiling.profiler
+        t = prof.start()
         self.set_input_as_array(ram, tiles)
+        prof.stop('set_input', t)
+
+        # The same inputs always give the same output, so reuse it if they were seen recently
+        if self._memo is not None:
+            key = self.inputs_as_array.tobytes()
+            memo = self._memo.get(key)
+            if memo is not None:
+                self._memo.move_to_end(key)
+                self.network.out, buttons, activations = memo
+                self.buttons_to_press[:] = buttons
+                for l, A in enumerate(activations, 1):
+                    self.network.params['A' + str(l)] = A
+                prof.count('forward_memo_hits')
+                return True
+            prof.count('forward_memo_misses')
 
         # Calculate the output
+        t = prof.start()
         output = self.network.feed_forward(self.inputs_as_array)
+        prof.stop('feed_forward', t)
         threshold = np.where(output > 0.5)[0]
         self.buttons_to_press.fill(0)  # Clear
 
@@ -185,6 +248,13 @@ class Mario(Individual):
         for b in threshold:
             self.buttons_to_press[ouput_to_buttons_map[b]] = 1
 
+        if self._memo is not None:
+            # feed_forward makes new arrays every call, so these aren't overwritten by the next one
+            activations = tuple(self.network.params['A' + str(l)] for l in range(1, len(self.network.layer_nodes)))
+            self._memo[key] = (output, self.buttons_to_press.copy(), activations)
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+
         return True
     
 def save_mario(population_folder: str, individual_name: str, mario: Mario) -> None:
@@ -211,6 +281,9 @@ def save_mario(population_folder: str, individual_name: str, mario: Mario) -> No
 
         np.save(os.path.join(individual_dir, w_name), weights)
         np.save(os.path.join(individual_dir, b_name), bias)
+
+    if mario.action_log is not None:
+        mario.action_log.save(individual_dir)
     
 def load_mario(population_folder: str, individual_name: str, config: Optional[Config] = None) -> Mario:
     # Make sure individual exists inside population folder
@@ -0,0 +1,150 @@
+"""
+Live training metrics served as Prometheus text on localhost.
+
+    metrics = TrainingMetrics()
+    server = MetricsServer(metrics, port=8000)
+    server.start()
+
+Then `curl http://127.0.0.1:8000/metrics`. The training loop updates the metrics with individual_finished
+and generation_finished, which only take a lock and add a few numbers.
+"""
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Deque, Iterable, List, Tuple
+
+
+class TrainingMetrics(object):
+    def __init__(self, rate_window: float = 10.0):
+        """
+        rate_window is how many seconds frames/sec and individuals/sec are averaged over
+        """
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+        self.start_time = time.time()
+
+        self.generation = 0
+        self.frames_total = 0
+        self.individuals_total = 0
+        self.wins_total = 0
+        self.best_fitness = 0.0
+        self.max_distance = 0
+        # Stats of the last completed generation
+        self.generation_best_fitness = 0.0
+        self.generation_mean_fitness = 0.0
+        self.generation_max_distance = 0
+        self.generation_wins = 0
+
+        # (time, frames_total, individuals_total)
+        self._samples: Deque[Tuple[float, int, int]] = deque()
+        self._samples.append((time.monotonic(), 0, 0))
+
+    def individual_finished(self, frames: int, fitness: float, distance: int, did_win: bool) -> None:
+        self.individuals_finished(frames, 1, int(did_win), fitness, distance)
+
+    def individuals_finished(self, frames: int, num_individuals: int, wins: int, best_fitness: float, max_distance: int) -> None:
+        """
+        Add a batch of finished individuals, i.e. a generation reported by another process
+        """
+        with self._lock:
+            self.frames_total += frames
+            self.individuals_total += num_individuals
+            self.wins_total += wins
+            self.best_fitness = max(self.best_fitness, best_fitness)
+            self.max_distance = max(self.max_distance, max_distance)
+            now = time.monotonic()
+            self._samples.append((now, self.frames_total, self.individuals_total))
+            # Nothing may be scraping, so don't wait for _rates to keep the window bounded
+            self._prune(now)
+
+    def generation_finished(self, generation: int, fitnesses: Iterable[float], distances: Iterable[int], wins: int) -> None:
+        fitnesses = list(fitnesses)
+        with self._lock:
+            self.generation = generation
+            self.generation_best_fitness = max(fitnesses) if fitnesses else 0.0
+            self.generation_mean_fitness = sum(fitnesses) / len(fitnesses) if fitnesses else 0.0
+            self.generation_max_distance = max(distances, default=0)
+            self.generation_wins = wins
+
+    def _prune(self, now: float) -> None:
+        # Drop samples outside the window but keep the newest of them as the starting point
+        while len(self._samples) > 1 and self._samples[1][0] <= now - self.rate_window:
+            self._samples.popleft()
+
+    def _rates(self, now: float) -> Tuple[float, float]:
+        self._prune(now)
+        t0, frames0, individuals0 = self._samples[0]
+        elapsed = now - t0
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (self.frames_total - frames0) / elapsed, (self.individuals_total - individuals0) / elapsed
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            fps, ips = self._rates(time.monotonic())
+            metrics: List[Tuple[str, str, str, float]] = [
+                ('smb_generation', 'gauge', 'Current generation', self.generation),
+                ('smb_frames_total', 'counter', 'Frames emulated', self.frames_total),
+                ('smb_individuals_total', 'counter', 'Individuals evaluated', self.individuals_total),
+                ('smb_wins_total', 'counter', 'Individuals that beat the level', self.wins_total),
+                ('smb_frames_per_second', 'gauge', f'Frames per second over the last {self.rate_window:g}s', fps),
+                ('smb_individuals_per_second', 'gauge', f'Individuals per second over the last {self.rate_window:g}s', ips),
+                ('smb_best_fitness', 'gauge', 'Best fitness so far', self.best_fitness),
+                ('smb_max_distance', 'gauge', 'Farthest distance so far', self.max_distance),
+                ('smb_generation_best_fitness', 'gauge', 'Best fitness of the last generation', self.generation_best_fitness),
+                ('smb_generation_mean_fitness', 'gauge', 'Mean fitness of the last generation', self.generation_mean_fitness),
+                ('smb_generation_max_distance', 'gauge', 'Farthest distance of the last generation', self.generation_max_distance),
+                ('smb_generation_wins', 'gauge', 'Wins in the last generation', self.generation_wins),
+                ('smb_uptime_seconds', 'gauge', 'Seconds since training started', time.time() - self.start_time),
+            ]
+
+        lines = []
+        for name, metric_type, help_text, value in metrics:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name} {float(value):.6g}')
+        return '\n'.join(lines) + '\n'
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer(object):
+    """
+    Serves TrainingMetrics on http://host:port/metrics from a daemon thread
+    """
+    def __init__(self, metrics: TrainingMetrics, port: int, host: str = '127.0.0.1'):
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] not in ('/', '/metrics'):
+                    handler.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode('utf-8')
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                # Don't spam stdout with every scrape
+                pass
+
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
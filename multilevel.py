@@ -0,0 +1,154 @@
+"""
+Evaluate each genome on several levels and aggregate the per-level fitness into one.
+
+The levels and how they are combined are set under [MultiLevel] in the config:
+    levels = (1-1, 2-1, 3-1)
+    level_weights = (1.0, 1.0, 2.0)   # Only used by the weighted reducer
+    reducer = mean                     # mean, min or weighted
+
+The emulator only allows one environment per process, so MultiLevelEvaluator runs one process per level
+for each worker. The levels of a genome are run at the same time.
+"""
+import multiprocessing as mp
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+from config import Config
+from emulator import make_env
+from evaluation import run_individual, get_result, RESULT_FIELDS
+from genetic_algorithm.population import Population
+from mario import Mario
+from neural_network import flatten_params, unflatten_params
+import profiling
+
+
+def _weighted(fitnesses: np.ndarray, weights: np.ndarray) -> float:
+    return float(np.dot(fitnesses, weights) / np.sum(weights))
+
+
+REDUCERS: Dict[str, Callable[[np.ndarray, np.ndarray], float]] = {
+    'mean': lambda fitnesses, weights: float(np.mean(fitnesses)),
+    'min': lambda fitnesses, weights: float(np.min(fitnesses)),
+    'weighted': _weighted,
+}
+
+
+def get_levels(config: Config) -> List[str]:
+    """
+    The levels to evaluate on. Falls back to [Misc] level when [MultiLevel] levels isn't set.
+    """
+    levels = [level.strip() for level in config.MultiLevel.levels if level.strip()]
+    return levels or [config.Misc.level]
+
+
+def get_level_weights(config: Config, levels: List[str]) -> np.ndarray:
+    weights = np.array(config.MultiLevel.level_weights, np.float64)
+    if config.MultiLevel.reducer == 'weighted' and len(weights) != len(levels):
+        raise Exception(f'level_weights has {len(weights)} values but there are {len(levels)} levels')
+    if len(weights) != len(levels):
+        weights = np.ones(len(levels))
+    return weights
+
+
+def set_level_results(config: Config, mario: Mario, levels: List[str], results: np.ndarray) -> None:
+    """
+    Set the stats of an individual from its (num_levels, len(RESULT_FIELDS)) results.
+    Fitness is calculated per level and then reduced. The frames, distance and score are summed over levels and
+    the individual only counts as a win if it beat every level. The per-level fitness is kept in mario.level_fitness.
+    """
+    reducer = config.MultiLevel.reducer
+    if reducer not in REDUCERS:
+        raise Exception(f'Unknown reducer "{reducer}". Options are {tuple(REDUCERS)}')
+
+    fitness_func = config.GeneticAlgorithm.fitness_func
+    fitnesses = np.array([fitness_func(int(frames), int(distance), int(score), bool(did_win))
+                          for frames, distance, _, score, did_win, _ in results])
+
+    mario._frames = int(results[:, 0].sum())
+    mario.x_dist = int(results[:, 1].sum())
+    mario.farthest_x = int(results[:, 2].sum())
+    mario.game_score = int(results[:, 3].sum())
+    mario.did_win = bool(results[:, 4].all())
+    mario.is_alive = False
+    mario.level_fitness = dict(zip(levels, fitnesses.tolist()))
+    mario._fitness = REDUCERS[reducer](fitnesses, get_level_weights(config, levels))
+
+
+def _level_worker(conn: Any, config_filename: str, level: str, env_factory: Optional[Callable[[str], Any]]) -> None:
+    config = Config(config_filename)
+    env = env_factory(level) if env_factory else make_env(level, ram_only=True)
+    layer_nodes = Mario(config).network.layer_nodes
+    # Forked with whatever the main process had recorded by then
+    prof = profiling.profiler
+    if prof.enabled:
+        prof.reset()
+    try:
+        while True:
+            genomes = conn.recv()
+            if genomes is None:
+                return
+            results = np.empty((genomes.shape[0], len(RESULT_FIELDS)))
+            for i, genome in enumerate(genomes):
+                mario = Mario(config, unflatten_params(genome, layer_nodes))
+                run_individual(env, mario)
+                results[i] = get_result(mario)
+            conn.send((results, prof.take() if prof.enabled else None))
+    finally:
+        env.close()
+
+
+class MultiLevelEvaluator(object):
+    def __init__(self, config: Config, levels: Optional[List[str]] = None, num_workers: int = 1,
+                 env_factory: Callable[[str], Any] = None):
+        """
+        Starts num_workers * len(levels) processes. The population is split between workers and
+        each worker runs its share on all levels at the same time.
+        """
+        self.config = config
+        self.levels = levels or get_levels(config)
+        self.num_workers = num_workers
+        self._conns = []
+        self._processes = []
+        # (num_individuals, num_levels, len(RESULT_FIELDS)) results of the last evaluate
+        self.results: Optional[np.ndarray] = None
+        for _ in range(num_workers):
+            worker_conns = []
+            for level in self.levels:
+                parent_conn, child_conn = mp.Pipe()
+                p = mp.Process(target=_level_worker, args=(child_conn, config.filename, level, env_factory), daemon=True)
+                p.start()
+                worker_conns.append(parent_conn)
+                self._processes.append(p)
+            self._conns.append(worker_conns)
+
+    def evaluate(self, population: Population) -> int:
+        """
+        Evaluate every individual on every level and set their aggregated fitness. Returns the number of frames emulated.
+        """
+        individuals = population.individuals
+        layer_nodes = individuals[0].network.layer_nodes
+        genomes = np.stack([flatten_params(individual.network.params, layer_nodes) for individual in individuals])
+        chunks = np.array_split(np.arange(len(individuals)), self.num_workers)
+
+        for worker_conns, chunk in zip(self._conns, chunks):
+            for conn in worker_conns:
+                conn.send(genomes[chunk])
+
+        results = np.empty((len(individuals), len(self.levels), len(RESULT_FIELDS)))
+        for worker_conns, chunk in zip(self._conns, chunks):
+            for l, conn in enumerate(worker_conns):
+                results[chunk, l], taken = conn.recv()
+                if taken is not None:
+                    profiling.profiler.merge(taken)
+        self.results = results
+
+        for individual, individual_results in zip(individuals, results):
+            set_level_results(self.config, individual, self.levels, individual_results)
+        return int(results[:, :, 0].sum())
+
+    def close(self) -> None:
+        for worker_conns in self._conns:
+            for conn in worker_conns:
+                conn.send(None)
+        for p in self._processes:
+            p.join()
@@ -0,0 +1,199 @@
+"""
+Novelty search.
+
+Each individual gets a behavior descriptor, either its trajectory (x, y) sampled every trajectory_interval frames or
+where it died. Its novelty is the mean distance to the k nearest descriptors among the archive and the current
+population. With mode = novelty the GA selects on novelty alone, with mode = novelty_fitness on a mix of the two
+where both are scaled by their max in the population.
+
+The archive holds at most archive_size descriptors and drops the oldest once full. Every generation each
+individual is added with probability add_probability. The kNN lookups use scipy's cKDTree (scipy is in
+requirements.txt). Without scipy a grid hash is used for descriptors with at most 3 dimensions (i.e. the death
+location) and a chunked brute force search otherwise, which is linear in the archive size.
+"""
+import itertools
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from config import Config
+from genetic_algorithm.population import Population
+from mario import Mario
+
+
+def get_behavior(mario: Mario, config: Config) -> np.ndarray:
+    if mario.trajectory is None or mario.location is None:
+        raise Exception('Novelty search needs individuals evaluated in this process with [Novelty] mode set')
+
+    descriptor = config.Novelty.descriptor
+    if descriptor == 'death':
+        return np.array(mario.location, np.float64)
+    elif descriptor == 'trajectory':
+        num_points = config.Novelty.trajectory_points
+        points = mario.trajectory[:num_points]
+        # Runs that ended early stay where they ended
+        points = points + [mario.location] * (num_points - len(points))
+        return np.array(points, np.float64).ravel()
+    raise Exception(f'Unknown novelty descriptor "{descriptor}"')
+
+
+class KDTreeIndex(object):
+    def __init__(self):
+        # Imported here so scipy is only loaded when novelty search is on
+        from scipy.spatial import cKDTree
+        self._cKDTree = cKDTree
+
+    def build(self, points: np.ndarray) -> None:
+        self._tree = self._cKDTree(points)
+
+    def query(self, queries: np.ndarray, k: int) -> np.ndarray:
+        distances, _ = self._tree.query(queries, k)
+        return distances.reshape((len(queries), k))
+
+
+class BruteForceIndex(object):
+    def __init__(self, chunk_size: int = 256):
+        self.chunk_size = chunk_size
+
+    def build(self, points: np.ndarray) -> None:
+        self._points = points
+        self._sq_norms = np.einsum('ij,ij->i', points, points)
+
+    def query(self, queries: np.ndarray, k: int) -> np.ndarray:
+        distances = np.empty((len(queries), k))
+        for start in range(0, len(queries), self.chunk_size):
+            q = queries[start:start + self.chunk_size]
+            # |a - b|^2 = |a|^2 - 2ab + |b|^2
+            d2 = np.einsum('ij,ij->i', q, q)[:, None] - 2 * q @ self._points.T + self._sq_norms[None, :]
+            nearest = np.partition(d2, k - 1, axis=1)[:, :k]
+            distances[start:start + len(q)] = np.sqrt(np.maximum(np.sort(nearest, axis=1), 0))
+        return distances
+
+
+class GridIndex(object):
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+
+    def build(self, points: np.ndarray) -> None:
+        self._points = points
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind='stable')
+        splits = np.cumsum(np.bincount(inverse.ravel(), minlength=len(keys)))[:-1]
+        self._cells: Dict[Tuple[int, ...], np.ndarray] = {tuple(key): indices for key, indices in zip(keys.tolist(), np.split(order, splits))}
+
+    def _shell(self, cell: Tuple[int, ...], r: int) -> List[np.ndarray]:
+        """
+        Indices of the points in the cells exactly r cells away from cell
+        """
+        found = []
+        for offset in itertools.product(range(-r, r + 1), repeat=len(cell)):
+            if r > 0 and max(abs(o) for o in offset) != r:
+                continue
+            indices = self._cells.get(tuple(c + o for c, o in zip(cell, offset)))
+            if indices is not None:
+                found.append(indices)
+        return found
+
+    def query(self, queries: np.ndarray, k: int) -> np.ndarray:
+        distances = np.empty((len(queries), k))
+        for i, q in enumerate(queries):
+            cell = tuple(np.floor(q / self.cell_size).astype(np.int64).tolist())
+            candidates = []
+            num_candidates = 0
+            r = 0
+            while True:
+                shell = self._shell(cell, r)
+                candidates.extend(shell)
+                num_candidates += sum(len(indices) for indices in shell)
+                if num_candidates >= k:
+                    d = np.sqrt(np.sum((self._points[np.concatenate(candidates)] - q) ** 2, axis=1))
+                    nearest = np.sort(np.partition(d, k - 1)[:k])
+                    # Anything outside the searched cells is at least r cells away
+                    if nearest[-1] <= r * self.cell_size or num_candidates == len(self._points):
+                        distances[i] = nearest
+                        break
+                r += 1
+        return distances
+
+
+def make_index(dims: int, cell_size: float):
+    try:
+        return KDTreeIndex()
+    except ImportError:
+        pass
+    if dims <= 3:
+        return GridIndex(cell_size)
+    return BruteForceIndex()
+
+
+class NoveltyArchive(object):
+    def __init__(self, config: Config):
+        self.config = config
+        self.mode = config.Novelty.mode
+        if self.mode not in ('novelty', 'novelty_fitness'):
+            raise Exception(f'Unknown novelty mode "{self.mode}". Options are (off, novelty, novelty_fitness)')
+        self.k = config.Novelty.k
+        self.max_size = config.Novelty.archive_size
+        self.add_probability = config.Novelty.add_probability
+        self.novelty_weight = config.Novelty.novelty_weight
+
+        self._behaviors: Optional[np.ndarray] = None
+        self._index = None
+        self.size = 0
+        self._next = 0
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional['NoveltyArchive']:
+        """
+        None when novelty search is off
+        """
+        if config.Novelty.mode == 'off':
+            return None
+        return cls(config)
+
+    def _add(self, behaviors: np.ndarray) -> None:
+        if self._behaviors is None:
+            self._behaviors = np.empty((self.max_size, behaviors.shape[1]))
+            self._index = make_index(behaviors.shape[1], self.config.Novelty.cell_size)
+        for behavior in behaviors:
+            self._behaviors[self._next] = behavior
+            self._next = (self._next + 1) % self.max_size
+            self.size = min(self.size + 1, self.max_size)
+
+    def score(self, population: Population) -> np.ndarray:
+        """
+        Set the novelty of every individual and replace its fitness for selection based on the mode.
+        The fitness from fitness_func is kept in individual.objective_fitness. Returns the novelty.
+        """
+        individuals = population.individuals
+        behaviors = np.stack([get_behavior(individual, self.config) for individual in individuals])
+        if self._index is None:
+            self._index = make_index(behaviors.shape[1], self.config.Novelty.cell_size)
+
+        points = behaviors
+        if self.size:
+            points = np.concatenate((self._behaviors[:self.size], behaviors))
+        # The nearest point to an individual is itself
+        k = min(self.k + 1, len(points))
+        self._index.build(points)
+        novelty = self._index.query(behaviors, k)[:, 1:].mean(axis=1) if k > 1 else np.zeros(len(individuals))
+
+        fitness = np.array([individual.fitness for individual in individuals], np.float64)
+        if self.mode == 'novelty':
+            selection_fitness = novelty
+        else:
+            max_fitness = max(np.max(np.abs(fitness)), 1e-12)
+            max_novelty = max(np.max(novelty), 1e-12)
+            selection_fitness = (1 - self.novelty_weight) * fitness / max_fitness + self.novelty_weight * novelty / max_novelty
+        # Floored like the fitness functions. Identical behaviors all have a novelty of 0, which roulette can't pick from
+        selection_fitness = np.maximum(selection_fitness, 0.00001)
+
+        for individual, n, f, s in zip(individuals, novelty, fitness, selection_fitness):
+            individual.novelty = float(n)
+            individual.objective_fitness = float(f)
+            individual._fitness = float(s)
+
+        added = np.random.random(len(individuals)) < self.add_probability
+        if np.any(added):
+            self._add(behaviors[added])
+        return novelty
@@ -0,0 +1,198 @@
+"""
+Low overhead stage timers for the hot paths.
+
+Usage:
+    t = profiling.profiler.start()
+    ...
+    profiling.profiler.stop('env_step', t)
+
+By default `profiler` is a NullProfiler where start/stop do nothing, so leaving the calls in costs two method calls.
+enable_profiling() swaps in a real Profiler. Always look up `profiling.profiler` at call time rather than
+importing the name, otherwise enabling it won't be seen. Worker processes send Profiler.take() back with their
+results and the main process merges it, so the summary covers the frames run by workers too.
+"""
+import csv
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# Stages that get a column in the per-generation summary
+STAGES = ('env_step', 'ram_decode', 'set_input', 'feed_forward', 'qt_paint', 'next_generation', 'save_mario', 'save_stats')
+# Histogram bucket i holds durations in [2**(i-1), 2**i) nanoseconds
+NUM_BUCKETS = 64
+
+
+class _Stage(object):
+    __slots__ = ['calls', 'total_ns', 'histogram']
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.histogram = [0] * NUM_BUCKETS
+
+    def percentile_us(self, q: float) -> float:
+        num_samples = sum(self.histogram)
+        if num_samples == 0:
+            return 0.0
+        target = q * num_samples
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                # Geometric middle of the bucket
+                return (2 ** (bucket - 0.5)) / 1e3 if bucket > 0 else 0.0
+        return 0.0
+
+
+class Profiler(object):
+    enabled = True
+
+    def __init__(self, sample_every: int = 16):
+        """
+        Every call is added to the monotonic counters, but only every sample_every'th call of a stage
+        goes into its histogram.
+        """
+        self.sample_every = sample_every
+        self._stages: Dict[str, _Stage] = {}
+        self._counters: Dict[str, int] = {}
+        self._window_start = time.perf_counter()
+
+    def start(self) -> int:
+        return time.perf_counter_ns()
+
+    def stop(self, stage: str, start: int) -> None:
+        elapsed = time.perf_counter_ns() - start
+        s = self._stages.get(stage)
+        if s is None:
+            s = self._stages[stage] = _Stage()
+        s.calls += 1
+        s.total_ns += elapsed
+        if s.calls % self.sample_every == 0:
+            s.histogram[min(elapsed.bit_length(), NUM_BUCKETS - 1)] += 1
+
+    def count(self, counter: str, value: int = 1) -> None:
+        self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Summary of everything since the last reset.
+        The number of frames is the number of env_step calls.
+        Counters named <name>_hits with a matching <name>_misses also get a <name>_hit_rate.
+        """
+        wall = time.perf_counter() - self._window_start
+        frames = self._stages['env_step'].calls if 'env_step' in self._stages else 0
+        summary = {
+            'frames': frames,
+            'wall_s': wall,
+            'fps': frames / wall if wall > 0 else 0.0,
+        }
+        for name in list(STAGES) + sorted(set(self._stages) - set(STAGES)):
+            s = self._stages.get(name, _Stage())
+            summary[f'{name}_calls'] = s.calls
+            summary[f'{name}_total_s'] = s.total_ns / 1e9
+            summary[f'{name}_mean_us'] = (s.total_ns / s.calls / 1e3) if s.calls else 0.0
+            summary[f'{name}_p50_us'] = s.percentile_us(0.5)
+            summary[f'{name}_p99_us'] = s.percentile_us(0.99)
+        for name in sorted(self._counters):
+            summary[name] = self._counters[name]
+        for name in sorted(self._counters):
+            if name.endswith('_hits'):
+                prefix = name[:-len('_hits')]
+                hits, misses = self._counters[name], self._counters.get(f'{prefix}_misses', 0)
+                summary[f'{prefix}_hit_rate'] = hits / (hits + misses)
+        return summary
+
+    def reset(self) -> None:
+        self._stages = {}
+        self._counters = {}
+        self._window_start = time.perf_counter()
+
+    def take(self) -> Tuple[Dict[str, Tuple[int, int, List[int]]], Dict[str, int]]:
+        """
+        The stages as (calls, total_ns, histogram) and the counters recorded since the last take or reset, which
+        are then cleared. A worker process sends these to be merged into the profiler of the main process.
+        """
+        stages = {name: (s.calls, s.total_ns, s.histogram) for name, s in self._stages.items()}
+        counters = self._counters
+        self._stages = {}
+        self._counters = {}
+        return stages, counters
+
+    def merge(self, taken: Tuple[Dict[str, Tuple[int, int, List[int]]], Dict[str, int]]) -> None:
+        """
+        Add what another process took (see take)
+        """
+        stages, counters = taken
+        for name, (calls, total_ns, histogram) in stages.items():
+            s = self._stages.get(name)
+            if s is None:
+                s = self._stages[name] = _Stage()
+            s.calls += calls
+            s.total_ns += total_ns
+            s.histogram = [a + b for a, b in zip(s.histogram, histogram)]
+        for name, value in counters.items():
+            self.count(name, value)
+
+    def write_summary(self, fname: str, generation: int) -> Dict[str, float]:
+        """
+        Append the summary as a row in fname, reset and return the summary
+        """
+        summary = {'generation': generation}
+        summary.update(self.summary())
+        self.reset()
+
+        directory = os.path.dirname(fname)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        write_header = not os.path.exists(fname)
+        with open(fname, 'a') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(summary), delimiter=',', extrasaction='ignore')
+            if write_header:
+                writer.writeheader()
+            writer.writerow(summary)
+        return summary
+
+    def format_summary(self, summary: Optional[Dict[str, float]] = None) -> str:
+        summary = summary if summary is not None else self.summary()
+        lines = ['{:.1f} FPS over {} frames in {:.2f}s'.format(summary['fps'], summary['frames'], summary['wall_s'])]
+        stages = [k[:-len('_calls')] for k in summary if k.endswith('_calls')]
+        for stage in stages:
+            if summary[f'{stage}_calls']:
+                lines.append('  {:<16} {:>9} calls {:>10.3f}s total {:>10.1f}us mean {:>10.1f}us p50 {:>10.1f}us p99'.format(
+                    stage, summary[f'{stage}_calls'], summary[f'{stage}_total_s'], summary[f'{stage}_mean_us'],
+                    summary[f'{stage}_p50_us'], summary[f'{stage}_p99_us']))
+        for name in [k[:-len('_hit_rate')] for k in summary if k.endswith('_hit_rate')]:
+            lines.append('  {:<16} {:>9} hits {:>9} misses {:>9.1%} hit rate'.format(
+                name, summary[f'{name}_hits'], summary.get(f'{name}_misses', 0), summary[f'{name}_hit_rate']))
+        return '\n'.join(lines)
+
+
+class NullProfiler(object):
+    enabled = False
+
+    def start(self) -> int:
+        return 0
+
+    def stop(self, stage: str, start: int) -> None:
+        pass
+
+    def count(self, counter: str, value: int = 1) -> None:
+        pass
+
+
+profiler = NullProfiler()
+
+
+def enable_profiling(sample_every: int = 16) -> Profiler:
+    global profiler
+    profiler = Profiler(sample_every)
+    return profiler
+
+
+def get_profile_filename(stats_fname: str) -> str:
+    """
+    The profile summary is written next to the stats csv, i.e. /path/stats.csv -> /path/stats_profile.csv
+    """
+    return os.path.splitext(stats_fname)[0] + '_profile.csv'
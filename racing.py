@@ -0,0 +1,75 @@
+"""
+Successive halving evaluation.
+
+Individuals normally run until Mario.update kills them, which takes a long time for ones that stay alive without
+getting anywhere. With [Racing] enabled = True a generation is evaluated in rungs instead. In the first rung every
+individual runs for budgets[0] frames. The ones still alive are ranked with the same fitness_func on what they did
+so far, and only the best keep_fraction of the rung are resumed from the savestate they stopped at, up to
+budgets[1] frames, and so on. The last rung has no budget and runs until Mario.update ends the run as usual.
+
+Individuals that die keep their fitness. Individuals that are not promoted keep the fitness of the frames they ran.
+Nothing is emulated twice, so the frames emulated are still the sum of the frames of every individual.
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from action_log import ActionLog
+from config import Config
+from emulator import get_state, set_state
+from evaluation import advance_individual
+from mario import Mario
+from trajectory_store import TrajectoryStore
+
+
+def get_budgets(config: Config) -> Tuple[Optional[int], ...]:
+    """
+    Frame budget of each rung. The last rung is None, i.e. until the individual dies.
+    """
+    budgets = tuple(budget for budget in config.Racing.budgets)
+    if any(b <= a for a, b in zip(budgets, budgets[1:])) or (budgets and budgets[0] <= 0):
+        raise Exception('[Racing] budgets must be positive and increasing')
+    return budgets + (None,)
+
+
+def evaluate_racing(env: Any, individuals: List[Mario], budgets: Tuple[Optional[int], ...], keep_fraction: float,
+                    record_actions: bool = False, debug: bool = False,
+                    trajectories: Optional[TrajectoryStore] = None) -> int:
+    """
+    Evaluate individuals by successive halving over the budgets from get_budgets. Returns the number of frames emulated.
+    If record_actions is set, the buttons pressed each frame are kept in mario.action_log across rungs.
+    """
+    racing = list(individuals)
+    states: Dict[int, Any] = {}
+    for rung, budget in enumerate(budgets):
+        for individual in racing:
+            if rung == 0:
+                env.reset()
+                if record_actions:
+                    individual.action_log = ActionLog()
+            else:
+                set_state(env, states.pop(id(individual)))
+            advance_individual(env, individual, budget, action_log=individual.action_log, trajectories=trajectories)
+            individual.calculate_fitness()
+            # The state has to be saved now since the emulator moves on to the next individual
+            if budget is not None and individual.is_alive:
+                states[id(individual)] = get_state(env)
+
+        if budget is None:
+            break
+
+        # Promote the best of the ones still running. The ones that died are done either way
+        ranked = sorted((individual for individual in racing if individual.is_alive),
+                        key=lambda individual: individual.fitness, reverse=True)
+        num_promoted = int(math.ceil(keep_fraction * len(ranked)))
+        racing = ranked[:num_promoted]
+        for individual in ranked[num_promoted:]:
+            individual.is_alive = False
+        states = {id(individual): states[id(individual)] for individual in racing}
+        if debug:
+            print(f'Racing rung {rung}: {len(ranked)} alive after {budget} frames, {len(racing)} promoted')
+        if not racing:
+            break
+
+    for individual in individuals:
+        individual.is_alive = False
+    return sum(individual._frames for individual in individuals)
@@ -0,0 +1,279 @@
+"""
+Record RAM traces from the emulator and serve them back without it.
+
+A trace is a compressed .npz file with:
+    ram             (num_frames, 2048) uint8. Stored XOR'd against the previous frame since most RAM doesn't change.
+    screens         (num_frames, 240, 256, 3) uint8. Optional and stored the same way as ram.
+    actions         (num_frames,) uint16. Bitmask of the 9 buttons that produced each frame (0 for reset frames).
+    episode_starts  Frame indices where env.reset() was called.
+    level           Level the trace was recorded on.
+
+TraceEnv has the reset/step/get_ram interface of the retro environment, so anything that runs against the
+emulator can run against a trace instead, i.e. evaluation.run_individual(TraceEnv('trace.npz'), mario).
+The RAM fixtures under benchmarks/fixtures can also be loaded as single-episode traces.
+
+Usage:
+    python ram_trace.py record --replay-file "Example world1-1" --replay-inds 1213 -o 1-1.npz [--screens]
+    python ram_trace.py bench 1-1.npz [-c settings.config]
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from config import Config
+from mario import Mario, load_mario
+from utils import SMB
+
+
+def pack_buttons(buttons: np.ndarray) -> int:
+    """
+    Pack the 9 buttons into a bitmask where bit i is button i
+    """
+    return int(np.dot(np.asarray(buttons, np.uint16) != 0, 1 << np.arange(len(buttons), dtype=np.uint16)))
+
+
+def unpack_buttons(mask: int, num_buttons: int = 9) -> np.ndarray:
+    return ((int(mask) >> np.arange(num_buttons)) & 1).astype(np.int8)
+
+
+def _delta_encode(frames: np.ndarray) -> np.ndarray:
+    delta = frames.copy()
+    np.bitwise_xor(frames[1:], frames[:-1], out=delta[1:])
+    return delta
+
+
+def _delta_decode(delta: np.ndarray) -> np.ndarray:
+    return np.bitwise_xor.accumulate(delta, axis=0)
+
+
+class TraceRecorder(object):
+    """
+    Wraps an environment and records the RAM, actions and optionally screens of every frame
+    """
+    def __init__(self, env: Any, level: str = '', record_screens: bool = False):
+        self.env = env
+        self.level = level
+        self.record_screens = record_screens
+        self._ram: List[np.ndarray] = []
+        self._screens: List[np.ndarray] = []
+        self._actions: List[int] = []
+        self._episode_starts: List[int] = []
+
+    @property
+    def num_frames(self) -> int:
+        return len(self._ram)
+
+    def _record(self, obs: np.ndarray, action: int) -> None:
+        ram = obs if obs.ndim == 1 else self.env.get_ram()
+        self._ram.append(ram.copy())
+        if self.record_screens:
+            screen = obs if obs.ndim == 3 else self.env.get_screen()
+            self._screens.append(screen.copy())
+        self._actions.append(action)
+
+    def reset(self) -> np.ndarray:
+        obs = self.env.reset()
+        self._episode_starts.append(self.num_frames)
+        self._record(obs, 0)
+        return obs
+
+    def step(self, action: np.ndarray) -> Tuple[np.ndarray, float, bool, Dict[str, Any]]:
+        ret = self.env.step(action)
+        self._record(ret[0], pack_buttons(action))
+        return ret
+
+    def get_ram(self) -> np.ndarray:
+        return self.env.get_ram()
+
+    def close(self) -> None:
+        self.env.close()
+
+    def save(self, fname: str) -> None:
+        directory = os.path.dirname(fname)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        data = {
+            'ram': _delta_encode(np.stack(self._ram)),
+            'actions': np.array(self._actions, np.uint16),
+            'episode_starts': np.array(self._episode_starts, np.int64),
+            'level': self.level,
+        }
+        if self.record_screens:
+            data['screens'] = _delta_encode(np.stack(self._screens))
+        np.savez_compressed(fname, **data)
+
+
+def load_trace(fname: str) -> Dict[str, np.ndarray]:
+    """
+    Load a trace (or a RAM fixture) and decode it
+    """
+    with np.load(fname) as data:
+        # RAM fixtures are stored as is and don't have actions
+        is_trace = 'actions' in data
+        ram = _delta_decode(data['ram']) if is_trace else data['ram']
+        num_frames = ram.shape[0]
+        trace = {
+            'ram': ram,
+            'actions': data['actions'] if is_trace else np.zeros(num_frames, np.uint16),
+            'episode_starts': data['episode_starts'] if is_trace else np.array([0], np.int64),
+            'level': str(data['level']) if 'level' in data else '',
+        }
+        if 'screens' in data:
+            trace['screens'] = _delta_decode(data['screens'])
+    return trace
+
+
+class TraceEnv(object):
+    """
+    Stand-in for the retro environment that serves frames from a recorded trace.
+    Actions passed to step are ignored since the trace can't react to them. Each episode of the trace
+    is served in order by reset, and step returns done=True once the episode runs out of frames.
+    """
+    def __init__(self, fname: str, obs_type: str = 'ram'):
+        self.fname = fname
+        self.trace = load_trace(fname)
+        self._ram = self.trace['ram']
+        self._screens = self.trace.get('screens', None)
+        if obs_type == 'image' and self._screens is None:
+            raise Exception(f'{fname} does not contain screens')
+        if obs_type not in ('ram', 'image'):
+            raise Exception(f'Unknown obs_type "{obs_type}"')
+        self.obs_type = obs_type
+        self.level = self.trace['level']
+
+        starts = list(self.trace['episode_starts']) + [self._ram.shape[0]]
+        self._episodes = list(zip(starts[:-1], starts[1:]))
+        self._episode = -1
+        self._frame = 0
+        self._end = 0
+
+    @property
+    def num_frames(self) -> int:
+        return self._ram.shape[0]
+
+    def _obs(self) -> np.ndarray:
+        if self.obs_type == 'image':
+            return self._screens[self._frame]
+        return self._ram[self._frame]
+
+    def reset(self) -> np.ndarray:
+        # Go to the next episode, wrapping around once they've all been served
+        self._episode = (self._episode + 1) % len(self._episodes)
+        self._frame, self._end = self._episodes[self._episode]
+        return self._obs()
+
+    def step(self, action: Optional[np.ndarray] = None) -> Tuple[np.ndarray, float, bool, Dict[str, Any]]:
+        if self._frame < self._end - 1:
+            self._frame += 1
+        done = self._frame >= self._end - 1
+        return self._obs(), 0.0, done, {'frame': self._frame, 'action': int(self.trace['actions'][self._frame])}
+
+    def get_state(self) -> Tuple[int, int, int]:
+        return self._episode, self._frame, self._end
+
+    def set_state(self, state: Tuple[int, int, int]) -> None:
+        self._episode, self._frame, self._end = state
+
+    def get_ram(self) -> np.ndarray:
+        return self._ram[self._frame]
+
+    def get_screen(self) -> np.ndarray:
+        if self._screens is None:
+            raise Exception(f'{self.fname} does not contain screens')
+        return self._screens[self._frame]
+
+    def close(self) -> None:
+        pass
+
+
+def record_individuals(population_folder: str, individual_names: List[str], fname: str,
+                       config: Optional[Config] = None, record_screens: bool = False) -> int:
+    """
+    Run saved individuals through the emulator and write every frame they see to a single trace.
+    Returns the number of frames recorded.
+    """
+    from emulator import make_env
+    from evaluation import run_individual
+
+    if not config:
+        config = Config(os.path.join(population_folder, 'settings.config'))
+    env = make_env(config.Misc.level, ram_only=not record_screens)
+    recorder = TraceRecorder(env, config.Misc.level, record_screens)
+    for name in individual_names:
+        mario = load_mario(population_folder, name, config)
+        run_individual(recorder, mario)
+        print(f'{name}: distance={mario.farthest_x} frames={mario._frames} win={mario.did_win}')
+    recorder.save(fname)
+    recorder.close()
+    return recorder.num_frames
+
+
+def benchmark_trace(fname: str, config: Config, num_individuals: int = 10) -> Dict[str, float]:
+    """
+    Time perception, inference and the whole evaluation loop over every frame of a trace
+    """
+    from evaluation import run_individual
+
+    env = TraceEnv(fname)
+    rams = env.trace['ram']
+    mario = Mario(config)
+    results = {}
+
+    start = time.perf_counter()
+    tiles = [SMB.get_tiles(ram) for ram in rams]
+    results['get_tiles_fps'] = len(rams) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for ram, t in zip(rams, tiles):
+        mario.set_input_as_array(ram, t)
+    results['set_input_as_array_fps'] = len(rams) / (time.perf_counter() - start)
+
+    inputs = mario.inputs_as_array
+    start = time.perf_counter()
+    for _ in range(len(rams)):
+        mario.network.feed_forward(inputs)
+    results['feed_forward_fps'] = len(rams) / (time.perf_counter() - start)
+
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(num_individuals):
+        individual = run_individual(env, Mario(config))
+        frames += individual._frames
+    results['evaluation_fps'] = frames / (time.perf_counter() - start)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Record and benchmark RAM traces')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    record = subparsers.add_parser('record', help='Record saved individuals running in the emulator')
+    record.add_argument('--replay-file', dest='replay_file', required=True, help='/path/to/population to record individuals from')
+    record.add_argument('--replay-inds', dest='replay_inds', required=True, help='ind1,ind2,... of best_ind_gen folders to record')
+    record.add_argument('-c', '--config', dest='config', required=False, help='config file to use')
+    record.add_argument('-o', '--output', dest='output', required=True, help='trace file to write')
+    record.add_argument('--screens', dest='screens', default=False, action='store_true', help='Also record screens')
+
+    bench = subparsers.add_parser('bench', help='Benchmark perception, inference and evaluation over a trace')
+    bench.add_argument('trace', help='trace file to benchmark')
+    bench.add_argument('-c', '--config', dest='config', default='settings.config', help='config file to use')
+    bench.add_argument('--num-individuals', dest='num_individuals', type=int, default=10, help='Number of individuals to run through the trace')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'record':
+        config = Config(args.config) if args.config else None
+        names = [f'best_ind_gen{ind}' for ind in args.replay_inds.split(',')]
+        num_frames = record_individuals(args.replay_file, names, args.output, config, args.screens)
+        print(f'Wrote {num_frames} frames to {args.output}')
+    elif args.command == 'bench':
+        results = benchmark_trace(args.trace, Config(args.config), args.num_individuals)
+        for name, value in results.items():
+            print('{:<25} {:>12.1f}'.format(name, value))
@@ -0,0 +1,175 @@
+"""
+Headless replay of saved individuals.
+
+Replays every best_ind_gen* folder under one or more population folders, spread over worker processes,
+and reports frames, distance and whether the individual won. Every frame's RAM is hashed (crc32) into a
+compact trace that can be saved as a golden trace and diffed against later, i.e. after changing
+perception or inference code:
+
+    python replay.py "Example world1-1" "Example world2-1" --golden goldens --save-golden
+    python replay.py Example* --golden goldens --expect-win
+
+Exits with 1 if any trace differs from its golden trace, or with --expect-win, if any individual doesn't win.
+"""
+import argparse
+import glob
+import multiprocessing as mp
+import os
+import sys
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from config import Config
+from emulator import make_env
+from evaluation import run_individual
+from mario import load_mario
+
+
+# Each worker process keeps one env and only recreates it when the level changes
+_env = None
+_env_level = None
+_env_factory: Optional[Callable[[str], Any]] = None
+
+
+def find_individuals(population_folder: str, inds: Optional[List[int]] = None) -> List[str]:
+    """
+    Names of the best_ind_gen* folders under a population folder, sorted by generation.
+    If inds is given, only those generations are returned.
+    """
+    names = []
+    for path in glob.glob(os.path.join(glob.escape(population_folder), 'best_ind_gen*')):
+        name = os.path.basename(path)
+        gen = int(name[len('best_ind_gen'):])
+        if inds is None or gen in inds:
+            names.append((gen, name))
+    return [name for _, name in sorted(names)]
+
+
+def hash_ram(ram: np.ndarray) -> int:
+    return zlib.crc32(ram.tobytes())
+
+
+def get_golden_filename(golden_dir: str, population_folder: str, individual_name: str) -> str:
+    return os.path.join(golden_dir, os.path.basename(os.path.normpath(population_folder)), individual_name + '.npy')
+
+
+def diff_traces(trace: np.ndarray, golden: np.ndarray) -> Optional[int]:
+    """
+    Returns the first frame where the traces differ, or None if they're the same
+    """
+    n = min(len(trace), len(golden))
+    mismatch = np.flatnonzero(trace[:n] != golden[:n])
+    if len(mismatch):
+        return int(mismatch[0])
+    if len(trace) != len(golden):
+        return n
+    return None
+
+
+def _init_worker(env_factory: Optional[Callable[[str], Any]]) -> None:
+    global _env_factory
+    _env_factory = env_factory
+
+
+def _get_env(level: str) -> Any:
+    global _env, _env_level
+    if _env_level != level:
+        if _env is not None:
+            _env.close()
+        _env = _env_factory(level) if _env_factory else make_env(level, ram_only=True)
+        _env_level = level
+    return _env
+
+
+def replay_individual(task: Tuple[str, str, Optional[int]]) -> Dict[str, Any]:
+    population_folder, individual_name, max_frames = task
+    config = Config(os.path.join(population_folder, 'settings.config'))
+    mario = load_mario(population_folder, individual_name, config)
+
+    hashes = []
+    run_individual(_get_env(config.Misc.level), mario, max_frames, on_frame=lambda ram: hashes.append(hash_ram(ram)))
+    return {
+        'population': population_folder,
+        'individual': individual_name,
+        'level': config.Misc.level,
+        'frames': mario._frames,
+        'distance': mario.farthest_x,
+        'did_win': mario.did_win,
+        'fitness': mario.fitness,
+        'trace': np.array(hashes, np.uint32),
+    }
+
+
+def replay(tasks: List[Tuple[str, str, Optional[int]]], processes: int = 1,
+           env_factory: Callable[[str], Any] = None) -> List[Dict[str, Any]]:
+    """
+    Replay (population_folder, individual_name, max_frames) tasks across processes. Results are in the same order as tasks.
+    """
+    # Group by level so a worker rarely has to recreate its env
+    order = sorted(range(len(tasks)), key=lambda i: Config(os.path.join(tasks[i][0], 'settings.config')).Misc.level)
+    results = [None] * len(tasks)
+    with mp.Pool(processes, initializer=_init_worker, initargs=(env_factory,)) as pool:
+        for i, result in zip(order, pool.imap(replay_individual, [tasks[i] for i in order])):
+            results[i] = result
+    return results
+
+
+def check_golden(result: Dict[str, Any], golden_dir: str, save_golden: bool) -> str:
+    """
+    Compare the RAM trace of a result against its golden trace. Returns a short status
+    """
+    fname = get_golden_filename(golden_dir, result['population'], result['individual'])
+    if save_golden:
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        np.save(fname, result['trace'])
+        return 'saved'
+    if not os.path.exists(fname):
+        return 'no golden'
+    golden = np.load(fname)
+    frame = diff_traces(result['trace'], golden)
+    if frame is None:
+        return 'match'
+    return f'DIFF at frame {frame} ({len(result["trace"])} vs {len(golden)} frames)'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Headless replay of saved Super Mario Bros AI individuals')
+    parser.add_argument('populations', nargs='+', help='Population folders to replay from, i.e. "Example world1-1"')
+    parser.add_argument('--inds', dest='inds', default=None, help='Comma separated generations to replay, i.e. 1213,1214. Default is every best_ind_gen* folder')
+    parser.add_argument('--processes', dest='processes', type=int, default=os.cpu_count(), help='Number of replay processes')
+    parser.add_argument('--max-frames', dest='max_frames', type=int, default=None, help='Stop each replay after this many frames')
+    parser.add_argument('--golden', dest='golden', default=None, help='Folder of golden RAM traces to diff against')
+    parser.add_argument('--save-golden', dest='save_golden', default=False, action='store_true', help='Save the traces as the new golden traces instead of diffing')
+    parser.add_argument('--expect-win', dest='expect_win', default=False, action='store_true', help='Fail if any individual does not win its level')
+    args = parser.parse_args()
+    if args.save_golden and not args.golden:
+        parser.error('--save-golden requires --golden')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    inds = [int(ind) for ind in args.inds.split(',')] if args.inds else None
+
+    tasks = []
+    for population_folder in args.populations:
+        for individual_name in find_individuals(population_folder, inds):
+            tasks.append((population_folder, individual_name, args.max_frames))
+    if not tasks:
+        raise Exception('No best_ind_gen* folders found')
+
+    failed = False
+    for result in replay(tasks, args.processes):
+        status = ''
+        if args.golden:
+            status = check_golden(result, args.golden, args.save_golden)
+            failed |= status.startswith('DIFF')
+        if args.expect_win and not result['did_win']:
+            failed = True
+            status = (status + ', ' if status else '') + 'DID NOT WIN'
+        print(f'{result["population"]}/{result["individual"]} ({result["level"]}): frames {result["frames"]}, '
+              f'distance {result["distance"]}, win {result["did_win"]}, fitness {result["fitness"]:.2f}'
+              + (f' [{status}]' if status else ''))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,80 @@
+"""
+Population genomes and results in shared memory.
+
+The genomes are a (num_individuals, num_genes) float64 array and the results a (num_individuals, len(SHARED_RESULT_FIELDS))
+float64 array, each in its own multiprocessing.shared_memory block. The GA writes the genomes, and worker processes
+build their networks directly on views of the rows and write the results back by individual index, so nothing is
+pickled per individual. Pickling a SharedPopulation only sends the block names, and the other side attaches to them.
+
+Only the process that created the blocks unlinks them.
+"""
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from evaluation import RESULT_FIELDS, set_result
+from mario import Mario
+from neural_network import flatten_params, unflatten_params
+
+
+SHARED_RESULT_FIELDS = RESULT_FIELDS + ('fitness',)
+
+
+class SharedPopulation(object):
+    def __init__(self, num_individuals: int, num_genes: int, names: Optional[Tuple[str, str]] = None):
+        """
+        Creates new blocks, or attaches to existing ones when names is given
+        """
+        self.num_individuals = num_individuals
+        self.num_genes = num_genes
+        self._owner = names is None
+        genome_size = max(num_individuals * num_genes * 8, 1)
+        result_size = max(num_individuals * len(SHARED_RESULT_FIELDS) * 8, 1)
+        if self._owner:
+            self._genome_shm = shared_memory.SharedMemory(create=True, size=genome_size)
+            self._result_shm = shared_memory.SharedMemory(create=True, size=result_size)
+        else:
+            self._genome_shm = shared_memory.SharedMemory(name=names[0])
+            self._result_shm = shared_memory.SharedMemory(name=names[1])
+
+        self.genomes = np.ndarray((num_individuals, num_genes), np.float64, buffer=self._genome_shm.buf)
+        self.results = np.ndarray((num_individuals, len(SHARED_RESULT_FIELDS)), np.float64, buffer=self._result_shm.buf)
+
+    @property
+    def names(self) -> Tuple[str, str]:
+        return self._genome_shm.name, self._result_shm.name
+
+    def __reduce__(self):
+        return (SharedPopulation, (self.num_individuals, self.num_genes, self.names))
+
+    def write_genomes(self, individuals: List[Mario]) -> None:
+        layer_nodes = individuals[0].network.layer_nodes
+        for i, individual in enumerate(individuals):
+            flatten_params(individual.network.params, layer_nodes, out=self.genomes[i])
+
+    def get_params(self, i: int, layer_nodes: List[int]) -> Dict[str, np.ndarray]:
+        """
+        Weights and bias of individual i as views into shared memory
+        """
+        return unflatten_params(self.genomes[i], layer_nodes)
+
+    def write_result(self, i: int, result: np.ndarray, fitness: float) -> None:
+        self.results[i, :len(RESULT_FIELDS)] = result
+        self.results[i, -1] = fitness
+
+    def read_results(self, individuals: List[Mario]) -> None:
+        """
+        Set the stats and fitness of the individuals from the results
+        """
+        for individual, row in zip(individuals, self.results):
+            set_result(individual, row[:len(RESULT_FIELDS)])
+
+    def close(self) -> None:
+        # The arrays have to go before the buffers can be released
+        self.genomes = None
+        self.results = None
+        self._genome_shm.close()
+        self._result_shm.close()
+        if self._owner:
+            self._genome_shm.unlink()
+            self._result_shm.unlink()
@@ -0,0 +1,103 @@
+"""
+Steady-state GA.
+
+The generational GA only creates the next generation once every individual of the current one is done, so with
+parallel workers every core waits for the slowest run, i.e. a winner with allow_additional_time_for_flagpole.
+With [SteadyState] enabled = True there are no generations to wait for. The population is the num_parents best
+(plus) or latest (comma) evaluated individuals, and a child is created from it whenever a worker is free:
+
+    individual = ga.ask()   # Unevaluated initial individual, or a child of the current population
+    ...                     # Evaluate it
+    ga.tell(individual)     # It enters the population
+
+Until the population has num_parents individuals everyone told is added. After that a new individual replaces the
+worst one with selection_type = plus, but only if it's fitter, and the oldest one with comma. Parents are picked and
+children created the same way as the generational GA (see generation.make_children).
+
+Every num_offspring individuals told count as one generation for reporting, saving, dynamic mutation rates and
+lifespan, which only applies to plus.
+"""
+from collections import deque
+from typing import Deque, List, Optional
+
+from config import Config
+from generation import make_children
+from genetic_algorithm.population import Population
+from mario import Mario
+
+
+class SteadyStateGA(object):
+    def __init__(self, config: Config, individuals: List[Mario], current_generation: int = 0):
+        """
+        individuals are evaluated before any child is made, i.e. the random or loaded initial population
+        """
+        selection_type = config.Selection.selection_type
+        if selection_type not in ('plus', 'comma'):
+            raise Exception('Unkown Selection type "{}"'.format(selection_type))
+        self.config = config
+        self.num_parents = config.Selection.num_parents
+        self.generation_size = config.Selection.num_offspring
+        self.plus = selection_type == 'plus'
+        self.population = Population([])
+        self.current_generation = current_generation
+
+        self._initial: Deque[Mario] = deque(individuals)
+        # make_children creates two, the second one is handed out by the next ask
+        self._children: Deque[Mario] = deque()
+        # Individuals told since the last generation ended
+        self._told: List[Mario] = []
+
+    @classmethod
+    def from_config(cls, config: Config, individuals: List[Mario], current_generation: int = 0) -> Optional['SteadyStateGA']:
+        """
+        None when the GA is generational
+        """
+        if not config.SteadyState.enabled:
+            return None
+        if config.GeneticAlgorithm.optimizer != 'ga':
+            raise Exception('[SteadyState] only supports the GA optimizer')
+        if config.Novelty.mode != 'off' or config.Surrogate.enabled or config.Racing.enabled:
+            raise Exception('[SteadyState] can not be used with [Novelty], [Surrogate] or [Racing] since they need a whole generation')
+        return cls(config, individuals, current_generation)
+
+    def ask(self) -> Mario:
+        """
+        Next individual to evaluate
+        """
+        if self._initial:
+            return self._initial.popleft()
+        # Only happens if every parent ran out of lifespan
+        if len(self.population.individuals) < 2:
+            return Mario(self.config)
+        if not self._children:
+            self._children.extend(make_children(self.population, self.config, self.current_generation))
+        return self._children.popleft()
+
+    def tell(self, individual: Mario) -> Optional[List[Mario]]:
+        """
+        Add an evaluated individual to the population.
+        Returns the individuals told this generation if it just ended, otherwise None.
+        """
+        # With comma the individuals are kept oldest first
+        individuals = self.population.individuals
+        if len(individuals) < self.num_parents:
+            individuals.append(individual)
+        elif self.plus:
+            worst = min(range(len(individuals)), key=lambda i: individuals[i].fitness)
+            if individual.fitness > individuals[worst].fitness:
+                individuals[worst] = individual
+        else:
+            individuals.pop(0)
+            individuals.append(individual)
+
+        self._told.append(individual)
+        if len(self._told) < self.generation_size:
+            return None
+
+        self.current_generation += 1
+        if self.plus:
+            for parent in individuals:
+                parent.lifespan -= 1
+            self.population.individuals = [parent for parent in individuals if parent.lifespan > 0]
+        told, self._told = self._told, []
+        return told
@@ -0,0 +1,206 @@
+"""
+Surrogate pre-screening of offspring.
+
+Most children are close to their parents and many of those parents are poor, so a full emulated run often only
+confirms what could have been guessed. With [Surrogate] enabled = True, a ridge regression is fit to the
+(features, fitness) pairs of every individual emulated so far. Each generation only the evaluate_fraction of
+children with the highest predicted fitness are emulated. The others keep their predicted fitness, capped at the
+worst emulated fitness of the generation so a child that never ran can't be selected over one that did.
+
+The features are either the flat genome, or the outputs of the network over a fixed set of random probe inputs.
+Probes compare what networks do instead of how their weights look, and are much smaller than the genome.
+
+A random audit_fraction of the rejected children is emulated anyway. Their true fitness goes into the history
+like any other, and the rank correlation between their predicted and true fitness is kept as audit_correlation.
+If it drops to zero or below the surrogate is no better than chance, so the next generation is emulated in full.
+"""
+import math
+from typing import List, Optional
+import numpy as np
+
+from config import Config
+from mario import Mario
+from neural_network import flatten_params
+
+
+def _average_ranks(a: np.ndarray) -> np.ndarray:
+    _, inverse, counts = np.unique(a, return_inverse=True, return_counts=True)
+    # Tied values share the mean of the ranks they span
+    ends = np.cumsum(counts)
+    return (ends - (counts - 1) / 2.0 - 1)[inverse.ravel()]
+
+
+def rank_correlation(a: np.ndarray, b: np.ndarray) -> Optional[float]:
+    """
+    Spearman rank correlation. None if either side is constant
+    """
+    rank_a = _average_ranks(a)
+    rank_b = _average_ranks(b)
+    rank_a -= rank_a.mean()
+    rank_b -= rank_b.mean()
+    denom = math.sqrt(np.dot(rank_a, rank_a) * np.dot(rank_b, rank_b))
+    if not denom:
+        return None
+    return float(np.dot(rank_a, rank_b) / denom)
+
+
+def make_probes(config: Config, num_inputs: int, num_probes: int, seed: int = 0) -> np.ndarray:
+    """
+    Random network inputs, (num_inputs, num_probes). Tiles are mostly empty with some blocks and a few enemies,
+    plus Mario's row if encode_row is set.
+    """
+    rand = np.random.RandomState(seed)
+    _, viz_width, viz_height = config.NeuralNetwork.input_dims
+    num_tiles = viz_width * viz_height
+    probes = np.zeros((num_inputs, num_probes))
+    probes[:num_tiles] = rand.choice([0, 1, -1], size=(num_tiles, num_probes), p=[0.7, 0.2, 0.1])
+    if config.NeuralNetwork.encode_row:
+        probes[num_tiles + rand.randint(0, viz_height, size=num_probes), np.arange(num_probes)] = 1
+    return probes
+
+
+class Surrogate(object):
+    def __init__(self, config: Config):
+        self.config = config
+        surrogate = config.Surrogate
+        if surrogate.features not in ('probe', 'genome'):
+            raise Exception(f'Unknown surrogate features "{surrogate.features}". Options are (probe, genome)')
+        self.features = surrogate.features
+        self.evaluate_fraction = surrogate.evaluate_fraction
+        self.audit_fraction = surrogate.audit_fraction
+        self.min_history = surrogate.min_history
+        self.history_size = surrogate.history_size
+        self.ridge_alpha = surrogate.ridge_alpha
+        self.num_probes = surrogate.num_probes
+
+        self._probes: Optional[np.ndarray] = None
+        self._X: Optional[np.ndarray] = None
+        self._y = np.empty(self.history_size)
+        self.history = 0
+        self._next = 0
+
+        # Set by fit
+        self._weights: Optional[np.ndarray] = None
+        self._x_mean = self._x_std = None
+        self._y_mean, self._y_std = 0.0, 1.0
+
+        # The current generation, set by select
+        self._individuals: List[Mario] = []
+        self._features: Optional[np.ndarray] = None
+        self._predicted: Optional[np.ndarray] = None
+        self._emulated: Optional[np.ndarray] = None
+        self._audited: Optional[np.ndarray] = None
+        self.audit_correlation: Optional[float] = None
+        self.num_predicted = 0
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional['Surrogate']:
+        """
+        None when the surrogate is disabled
+        """
+        if not config.Surrogate.enabled:
+            return None
+        return cls(config)
+
+    def get_features(self, individuals: List[Mario]) -> np.ndarray:
+        layer_nodes = individuals[0].network.layer_nodes
+        if self.features == 'genome':
+            return np.stack([flatten_params(individual.network.params, layer_nodes) for individual in individuals])
+
+        if self._probes is None:
+            self._probes = make_probes(self.config, layer_nodes[0], self.num_probes)
+        # The probes go through each network as one batch, (6, num_probes) outputs per individual
+        return np.stack([individual.network.feed_forward(self._probes).ravel() for individual in individuals])
+
+    def _add(self, X: np.ndarray, y: np.ndarray) -> None:
+        if self._X is None:
+            self._X = np.empty((self.history_size, X.shape[1]))
+        for x, fitness in zip(X, y):
+            self._X[self._next] = x
+            self._y[self._next] = fitness
+            self._next = (self._next + 1) % self.history_size
+            self.history = min(self.history + 1, self.history_size)
+
+    def fit(self) -> None:
+        X = self._X[:self.history]
+        y = self._y[:self.history]
+        self._x_mean = X.mean(axis=0)
+        self._x_std = X.std(axis=0)
+        self._x_std[self._x_std == 0] = 1
+        self._y_mean = y.mean()
+        self._y_std = y.std() or 1.0
+        Xs = (X - self._x_mean) / self._x_std
+        ys = (y - self._y_mean) / self._y_std
+        n, d = Xs.shape
+        if d <= n:
+            # (X^T X + aI) w = X^T y
+            A = Xs.T @ Xs
+            A[np.diag_indices(d)] += self.ridge_alpha
+            self._weights = np.linalg.solve(A, Xs.T @ ys)
+        else:
+            # Same solution through the n x n system, w = X^T (X X^T + aI)^-1 y
+            K = Xs @ Xs.T
+            K[np.diag_indices(n)] += self.ridge_alpha
+            self._weights = Xs.T @ np.linalg.solve(K, ys)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return ((X - self._x_mean) / self._x_std) @ self._weights * self._y_std + self._y_mean
+
+    def select(self, individuals: List[Mario]) -> List[Mario]:
+        """
+        Return the individuals that should be emulated. Call finish once they have been.
+        """
+        self._individuals = individuals
+        self._features = self.get_features(individuals)
+        n = len(individuals)
+        # Not enough history yet
+        if self.history < self.min_history:
+            self._predicted = None
+            self._emulated = np.ones(n, bool)
+            self._audited = np.zeros(n, bool)
+            return list(individuals)
+
+        self.fit()
+        self._predicted = self.predict(self._features)
+        # The last audit said the model is no better than chance. Emulate everyone and audit all of them
+        if self.audit_correlation is not None and self.audit_correlation <= 0:
+            self._emulated = np.zeros(n, bool)
+            self._audited = np.ones(n, bool)
+            return list(individuals)
+
+        num_emulated = max(1, int(math.ceil(self.evaluate_fraction * n)))
+        self._emulated = np.zeros(n, bool)
+        self._emulated[np.argsort(-self._predicted)[:num_emulated]] = True
+        self._audited = ~self._emulated & (np.random.random(n) < self.audit_fraction)
+        return [individual for individual, run in zip(individuals, self._emulated | self._audited) if run]
+
+    def finish(self) -> None:
+        """
+        Add the emulated individuals to the history and give the rest their predicted fitness
+        """
+        individuals = self._individuals
+        ran = self._emulated | self._audited
+        fitness = np.array([individual.fitness for individual in individuals], np.float64)
+        self._add(self._features[ran], fitness[ran])
+
+        self.num_predicted = int(np.sum(~ran))
+        if self._predicted is None:
+            return
+        # A couple of audits say nothing about the ranking
+        if np.sum(self._audited) >= 3:
+            correlation = rank_correlation(self._predicted[self._audited], fitness[self._audited])
+            if correlation is not None:
+                self.audit_correlation = correlation
+
+        # Strictly below, so ties don't go to an individual that never ran. Floored like the fitness functions since
+        # roulette selection needs positive fitness
+        cap = np.nextafter(fitness[ran].min(), -np.inf)
+        for individual, run, predicted in zip(individuals, ran, self._predicted):
+            if not run:
+                individual._fitness = float(max(min(predicted, cap), 0.00001))
+
+    def emulated(self) -> List[Mario]:
+        """
+        The individuals of the current generation that were actually emulated
+        """
+        return [individual for individual, run in zip(self._individuals, self._emulated | self._audited) if run]
@@ -0,0 +1,53 @@
+import os
+import random
+import numpy as np
+
+from config import Config
+from generation import make_children
+from genetic_algorithm.population import Population
+from mario import Mario
+from novelty import NoveltyArchive
+
+
+SETTINGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings.config')
+
+
+def make_config(tmp_path, mode: str, descriptor: str) -> Config:
+    with open(SETTINGS) as f:
+        text = f.read()
+    text = text.replace('mode = off  # off, novelty or novelty_fitness', f'mode = {mode}')
+    text = text.replace('descriptor = trajectory  # trajectory or death', f'descriptor = {descriptor}')
+    fname = tmp_path / 'settings.config'
+    fname.write_text(text)
+    config = Config(str(fname))
+    assert config.Novelty.mode == mode
+    assert config.Crossover.crossover_selection == 'roulette'
+    return config
+
+
+def identical_population(config: Config, size: int = 10) -> Population:
+    individuals = []
+    for _ in range(size):
+        mario = Mario(config)
+        mario.location = (100, 50)
+        mario.trajectory = [(40, 50), (100, 50)]
+        mario._fitness = 0.00001
+        individuals.append(mario)
+    return Population(individuals)
+
+
+def test_identical_behaviors_can_be_selected(tmp_path):
+    random.seed(0)
+    np.random.seed(0)
+    for mode in ('novelty', 'novelty_fitness'):
+        for descriptor in ('death', 'trajectory'):
+            config = make_config(tmp_path, mode, descriptor)
+            population = identical_population(config)
+            archive = NoveltyArchive.from_config(config)
+
+            novelty = archive.score(population)
+
+            assert np.all(novelty == 0)
+            assert all(individual.fitness > 0 for individual in population.individuals)
+            c1, c2 = make_children(population, config, 0)
+            assert isinstance(c1, Mario) and isinstance(c2, Mario)
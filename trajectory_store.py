@@ -0,0 +1,131 @@
+"""
+Per-frame trajectories of every individual in a generation.
+
+With [Trajectories] enabled = True, every frame where an individual decides which buttons to press is recorded as
+its index in the generation (uint32), its x (uint16) and y (uint8) in the level and the buttons it pressed packed
+into a uint8 (bits U, D, L, R, A, B from low to high). That is 8 bytes a frame, kept in a preallocated ring buffer.
+
+At the end of a generation the buffer is handed to a background thread that writes it to
+<folder>/trajectories_gen<N>.npz with np.savez_compressed, while recording goes on in a second buffer.
+The two buffers together never use more than max_memory_mb. If a generation has more frames than a buffer holds,
+the oldest frames of that generation are overwritten and the file says how many were dropped.
+
+The file holds the arrays individual, x, y and buttons in the order the frames were recorded, plus dropped.
+Frames of one individual are in order but not necessarily next to each other (i.e. with [Racing]).
+"""
+import os
+import queue
+import threading
+from typing import Dict, Optional
+import numpy as np
+
+from config import Config
+from mario import Mario
+
+
+FRAME_DTYPE = np.dtype([('individual', np.uint32), ('x', np.uint16), ('y', np.uint8), ('buttons', np.uint8)])
+# Index in buttons_to_press of the U, D, L, R, A, B buttons the network controls
+BUTTON_INDICES = (4, 5, 6, 7, 8, 0)
+
+
+def get_trajectory_filename(folder: str, generation: int) -> str:
+    return os.path.join(folder, f'trajectories_gen{generation}.npz')
+
+
+def pack_buttons(buttons_to_press: np.ndarray) -> int:
+    packed = 0
+    for bit, index in enumerate(BUTTON_INDICES):
+        if buttons_to_press[index]:
+            packed |= 1 << bit
+    return packed
+
+
+def unpack_buttons(packed: np.ndarray) -> np.ndarray:
+    """
+    (num_frames, 6) bool array of U, D, L, R, A, B
+    """
+    return (packed[:, None] >> np.arange(len(BUTTON_INDICES), dtype=np.uint8)) & 1 == 1
+
+
+def load_trajectories(fname: str) -> Dict[str, np.ndarray]:
+    with np.load(fname) as data:
+        return {key: data[key] for key in data.files}
+
+
+class TrajectoryStore(object):
+    def __init__(self, folder: str, max_memory_mb: float):
+        self.folder = folder
+        self.capacity = max(int(max_memory_mb * 2**20 / 2 / FRAME_DTYPE.itemsize), 1)
+        self._buffers = [np.empty(self.capacity, FRAME_DTYPE), np.empty(self.capacity, FRAME_DTYPE)]
+        self._buffer = self._buffers[0]
+        self.num_frames = 0  # Frames recorded this generation, including dropped ones
+        self._individuals: Dict[int, int] = {}
+
+        self._queue: queue.Queue = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._writer, name='trajectory-writer', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional['TrajectoryStore']:
+        """
+        None when trajectories are not recorded
+        """
+        if not config.Trajectories.enabled:
+            return None
+        if not config.Trajectories.folder:
+            raise Exception('[Trajectories] folder must be set')
+        return cls(config.Trajectories.folder, config.Trajectories.max_memory_mb)
+
+    def record(self, mario: Mario) -> None:
+        """
+        Record the frame mario just decided the buttons for
+        """
+        index = self._individuals.get(id(mario))
+        if index is None:
+            index = self._individuals[id(mario)] = len(self._individuals)
+        location = mario.location
+        self._buffer[self.num_frames % self.capacity] = (index, location.x, location.y, pack_buttons(mario.buttons_to_press))
+        self.num_frames += 1
+
+    def end_generation(self, generation: int) -> None:
+        """
+        Write the frames recorded since the last call in the background and start on the other buffer
+        """
+        # The buffer recording switches to was handed to the writer last generation. Wait until it's written
+        self._queue.join()
+        if self._error is not None:
+            raise Exception('Writing trajectories failed') from self._error
+        self._queue.put((self._buffer, self.num_frames, get_trajectory_filename(self.folder, generation)))
+        self._buffer = self._buffers[1] if self._buffer is self._buffers[0] else self._buffers[0]
+        self.num_frames = 0
+        self._individuals = {}
+
+    def _writer(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            buffer, num_frames, fname = job
+            try:
+                if num_frames > self.capacity:
+                    # Unroll the ring so the oldest kept frame is first
+                    start = num_frames % self.capacity
+                    frames = np.concatenate((buffer[start:], buffer[:start]))
+                else:
+                    frames = buffer[:num_frames]
+                os.makedirs(os.path.dirname(fname) or '.', exist_ok=True)
+                np.savez_compressed(fname, individual=frames['individual'], x=frames['x'], y=frames['y'],
+                                    buttons=frames['buttons'], dropped=max(num_frames - self.capacity, 0))
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def close(self) -> None:
+        """
+        Wait for the pending writes. Frames recorded after the last end_generation are not written
+        """
+        self._queue.put(None)
+        self._thread.join()
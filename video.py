@@ -0,0 +1,388 @@
+"""
+Headless video export of saved individuals.
+
+Replays individuals without Qt and writes the screen of every frame to a video or animated image.
+Frames are handed to a background encoder thread through a bounded queue, so the emulator keeps running
+while the previous frames are encoded. The tile grid and the network (like Visualizer and NeuralNetworkViz)
+can be drawn next to the screen with NumPy.
+
+    python video.py "Example world1-1" --inds 1213,1214 --output videos --tiles --network
+    python video.py "Example world4-1" --source actions --format gif --frame-skip 3
+
+ffmpeg is used if it's on the PATH and can write any format it supports (mp4, webm, gif, ...).
+Without it, gif, webp and png (APNG) are written with Pillow, which keeps the frames in memory until the end.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from action_log import ActionLog
+from config import Config
+from emulator import make_env
+from evaluation import OUTPUT_TO_KEYS_MAP
+from mario import Mario, load_mario
+from neural_network import FeedForwardNetwork
+from utils import SMB, ColorMap, StaticTileType, DynamicTileType, EnemyType
+
+
+_WHITE = (255, 255, 255)
+_BLACK = (0, 0, 0)
+_GREEN = (0, 255, 0)
+_ROI_COLOR = (255, 0, 217)
+_POSITIVE_WEIGHT = (0, 0, 255)
+_NEGATIVE_WEIGHT = (255, 0, 0)
+_PIL_FORMATS = ('.gif', '.webp', '.png')
+
+
+def _draw_rect(img: np.ndarray, x: int, y: int, w: int, h: int, color: Tuple[int, int, int], thickness: int = 1) -> None:
+    """
+    Outline of a rectangle, clipped to the image
+    """
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, img.shape[1]), min(y + h, img.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    img[y0:min(y0 + thickness, y1), x0:x1] = color
+    img[max(y1 - thickness, y0):y1, x0:x1] = color
+    img[y0:y1, x0:min(x0 + thickness, x1)] = color
+    img[y0:y1, max(x1 - thickness, x0):x1] = color
+
+
+def _draw_line(img: np.ndarray, x0: int, y0: int, x1: int, y1: int, color: Tuple[int, int, int]) -> None:
+    n = max(abs(x1 - x0), abs(y1 - y0)) + 1
+    xs = np.rint(np.linspace(x0, x1, n)).astype(np.int64)
+    ys = np.rint(np.linspace(y0, y1, n)).astype(np.int64)
+    keep = (xs >= 0) & (xs < img.shape[1]) & (ys >= 0) & (ys < img.shape[0])
+    img[ys[keep], xs[keep]] = color
+
+
+def render_tiles(ram: np.ndarray, tiles: Dict[Tuple[int, int], Any], config: Config, tile_size: int = 8) -> np.ndarray:
+    """
+    The 15x16 tile grid as Visualizer.draw_tiles draws it, with the input region of the network outlined.
+    Returns a (15 * tile_size, 16 * tile_size, 3) uint8 image.
+    """
+    colors = np.empty((15, 16, 3), np.uint8)
+    for row in range(15):
+        for col in range(16):
+            tile = tiles[(row, col)]
+            if isinstance(tile, (StaticTileType, DynamicTileType, EnemyType)):
+                colors[row, col] = ColorMap[tile.name].value
+            else:
+                colors[row, col] = _WHITE
+
+    img = np.repeat(np.repeat(colors, tile_size, axis=0), tile_size, axis=1)
+    # Grid lines
+    img[::tile_size, :] = _BLACK
+    img[:, ::tile_size] = _BLACK
+
+    _, mario_col = SMB.get_mario_row_col(ram)
+    start_row, viz_width, viz_height = config.NeuralNetwork.input_dims
+    _draw_rect(img, mario_col * tile_size, start_row * tile_size, viz_width * tile_size, viz_height * tile_size, _ROI_COLOR, 2)
+    return img
+
+
+def render_network(network: FeedForwardNetwork, width: int, layer_spacing: int = 40) -> np.ndarray:
+    """
+    Hidden and output nodes of the network as NeuralNetworkViz.show_network draws them, using the activations
+    of the last feed_forward. Hidden nodes get greener the more active they are, outputs are green when pressed.
+    Returns a (num_layers * layer_spacing, width, 3) uint8 image.
+    """
+    layer_nodes = network.layer_nodes
+    L = len(layer_nodes)
+    cell = max(width // max(layer_nodes[1:]), 3)
+    node_size = max(min(cell - 2, 12), 2)
+    img = np.full(((L - 1) * layer_spacing, width, 3), 255, np.uint8)
+
+    # Top left corner of every node
+    locations = {}
+    for l in range(1, L):
+        x_offset = (width - layer_nodes[l] * cell) // 2
+        y = (l - 1) * layer_spacing + (layer_spacing - node_size) // 2
+        for node in range(layer_nodes[l]):
+            locations[(l, node)] = (x_offset + node * cell + (cell - node_size) // 2, y)
+
+    # Weights first so the nodes are drawn on top of them
+    half = node_size // 2
+    for l in range(2, L):
+        weights = network.params['W' + str(l)]
+        for curr_node in range(weights.shape[0]):
+            for prev_node in range(weights.shape[1]):
+                x0, y0 = locations[(l - 1, prev_node)]
+                x1, y1 = locations[(l, curr_node)]
+                color = _POSITIVE_WEIGHT if weights[curr_node, prev_node] > 0 else _NEGATIVE_WEIGHT
+                _draw_line(img, x0 + half, y0 + node_size, x1 + half, y1, color)
+
+    for l in range(1, L):
+        activations = network.params.get('A' + str(l))
+        for node in range(layer_nodes[l]):
+            x, y = locations[(l, node)]
+            if activations is None:
+                color = _WHITE
+            elif l == L - 1:
+                color = _GREEN if activations[node, 0] > 0.5 else _WHITE
+            else:
+                saturation = max(min(float(activations[node, 0]), 1.0), 0.0)
+                color = (int(255 * (1 - saturation)), 255, int(255 * (1 - saturation)))
+            img[y:y + node_size, x:x + node_size] = color
+            _draw_rect(img, x, y, node_size, node_size, _BLACK)
+    return img
+
+
+def compose_frame(screen: np.ndarray, panels: List[np.ndarray]) -> np.ndarray:
+    """
+    Put the panels in a column to the right of the screen
+    """
+    if not panels:
+        return screen
+    panel_width = max(panel.shape[1] for panel in panels)
+    panel_height = sum(panel.shape[0] for panel in panels)
+    height = max(screen.shape[0], panel_height)
+    frame = np.zeros((height, screen.shape[1] + panel_width, 3), np.uint8)
+    frame[:screen.shape[0], :screen.shape[1]] = screen
+    y = 0
+    for panel in panels:
+        frame[y:y + panel.shape[0], screen.shape[1]:screen.shape[1] + panel.shape[1]] = panel
+        y += panel.shape[0]
+    return frame
+
+
+class _FFmpegEncoder(object):
+    def __init__(self, fname: str, fps: float):
+        self.fname = fname
+        self.fps = fps
+        self._proc = None
+
+    def write(self, frame: np.ndarray) -> None:
+        if self._proc is None:
+            height, width = frame.shape[:2]
+            cmd = ['ffmpeg', '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(self.fps), '-i', '-']
+            if os.path.splitext(self.fname)[1].lower() not in _PIL_FORMATS:
+                # Most codecs want even dimensions
+                cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p']
+            self._proc = subprocess.Popen(cmd + [self.fname], stdin=subprocess.PIPE)
+        self._proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self) -> None:
+        if self._proc is None:
+            return
+        self._proc.stdin.close()
+        if self._proc.wait() != 0:
+            raise Exception(f'ffmpeg failed writing {self.fname}')
+
+
+class _PILEncoder(object):
+    def __init__(self, fname: str, fps: float):
+        self.fname = fname
+        self.fps = fps
+        self._frames = []
+
+    def write(self, frame: np.ndarray) -> None:
+        from PIL import Image
+        # Palette images are a third of the size to keep around
+        self._frames.append(Image.fromarray(frame).quantize(256))
+
+    def close(self) -> None:
+        if not self._frames:
+            return
+        self._frames[0].save(self.fname, save_all=True, append_images=self._frames[1:],
+                             duration=int(round(1000 / self.fps)), loop=0)
+        self._frames = []
+
+
+class VideoWriter(object):
+    def __init__(self, fname: str, fps: float = 60.0, queue_size: int = 128):
+        """
+        Encodes frames on a background thread. write() only blocks if queue_size frames are already waiting.
+        """
+        ext = os.path.splitext(fname)[1].lower()
+        if shutil.which('ffmpeg'):
+            self._encoder = _FFmpegEncoder(fname, fps)
+        elif ext in _PIL_FORMATS:
+            self._encoder = _PILEncoder(fname, fps)
+        else:
+            raise Exception(f'ffmpeg not found. Without it only {_PIL_FORMATS} can be written')
+        self.fname = fname
+        self.num_frames = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._encode_loop, name='video-encoder', daemon=True)
+        self._thread.start()
+
+    def _encode_loop(self) -> None:
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            # Keep draining after an error so write() never blocks forever
+            if self._error is None:
+                try:
+                    self._encoder.write(frame)
+                except BaseException as e:
+                    self._error = e
+        if self._error is None:
+            try:
+                self._encoder.close()
+            except BaseException as e:
+                self._error = e
+
+    def write(self, frame: np.ndarray) -> None:
+        """
+        The frame must not be modified after it's written
+        """
+        self._queue.put(frame)
+        self.num_frames += 1
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def export_run(env: Any, writer: VideoWriter, config: Config, mario: Optional[Mario] = None,
+               action_log: Optional[ActionLog] = None, draw_tiles: bool = False, draw_network: bool = False,
+               frame_skip: int = 1, max_frames: Optional[int] = None, tile_size: int = 8) -> int:
+    """
+    Run an individual (mario) or an action log through an env with screen observations and write every
+    frame_skip'th frame. The network can only be drawn when running an individual. Returns the frames emulated.
+    """
+    if (mario is None) == (action_log is None):
+        raise Exception('Pass exactly one of mario or action_log')
+    if draw_network and mario is None:
+        raise Exception('The network can only be drawn when running an individual')
+
+    keys = np.zeros(9, np.int8)
+    actions = None
+    if action_log is not None:
+        actions = (buttons for buttons, count in action_log.runs() for _ in range(count))
+
+    env.reset()
+    frames = 0
+    while True:
+        if mario is not None:
+            if not mario.is_alive:
+                break
+            buttons = mario.buttons_to_press
+        else:
+            buttons = next(actions, None)
+            if buttons is None:
+                break
+
+        screen, _, done, _ = env.step(buttons)
+        ram = env.get_ram()
+        tiles = None
+        if mario is not None or draw_tiles:
+            tiles = SMB.get_tiles(ram)
+        if mario is not None:
+            mario.update(ram, tiles, keys, OUTPUT_TO_KEYS_MAP)
+
+        if frames % frame_skip == 0:
+            panels = []
+            if draw_tiles:
+                panels.append(render_tiles(ram, tiles, config, tile_size))
+            if draw_network:
+                panels.append(render_network(mario.network, 16 * tile_size))
+            frame = compose_frame(screen, panels)
+            # The env may reuse its screen buffer
+            writer.write(frame.copy() if frame is screen else frame)
+        frames += 1
+        if done or (max_frames is not None and frames >= max_frames):
+            break
+
+    if mario is not None:
+        mario.calculate_fitness()
+    return frames
+
+
+# Each worker process keeps one env and only recreates it when the level changes
+_env = None
+_env_level = None
+_env_factory: Optional[Callable[[str], Any]] = None
+
+
+def _init_worker(env_factory: Optional[Callable[[str], Any]]) -> None:
+    global _env_factory
+    _env_factory = env_factory
+
+
+def _get_env(level: str) -> Any:
+    global _env, _env_level
+    if _env_level != level:
+        if _env is not None:
+            _env.close()
+        _env = _env_factory(level) if _env_factory else make_env(level)
+        _env_level = level
+    return _env
+
+
+def get_video_filename(output_dir: str, population_folder: str, individual_name: str, fmt: str) -> str:
+    population = os.path.basename(os.path.normpath(population_folder)).replace(' ', '_')
+    return os.path.join(output_dir, f'{population}_{individual_name}.{fmt}')
+
+
+def export_individual(task: Tuple[str, str, str, Dict[str, Any]]) -> Tuple[str, int]:
+    population_folder, individual_name, fname, options = task
+    config = Config(os.path.join(population_folder, 'settings.config'))
+    mario, action_log = None, None
+    if options['source'] == 'actions':
+        action_log = ActionLog.load(os.path.join(population_folder, individual_name))
+    else:
+        mario = load_mario(population_folder, individual_name, config)
+
+    writer = VideoWriter(fname, options['fps'] / options['frame_skip'], options['queue_size'])
+    try:
+        frames = export_run(_get_env(config.Misc.level), writer, config, mario, action_log,
+                            options['tiles'], options['network'], options['frame_skip'], options['max_frames'])
+    finally:
+        writer.close()
+    return fname, frames
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export videos of saved Super Mario Bros AI individuals without a display')
+    parser.add_argument('populations', nargs='+', help='Population folders to export from, i.e. "Example world1-1"')
+    parser.add_argument('--inds', dest='inds', default=None, help='Comma separated generations, i.e. 1213,1214. Default is every best_ind_gen* folder')
+    parser.add_argument('--output', dest='output', default='videos', help='Folder to write the videos to')
+    parser.add_argument('--format', dest='format', default='mp4', help='File extension of the videos, i.e. mp4, gif, webp')
+    parser.add_argument('--source', dest='source', choices=('network', 'actions'), default='network', help='Run the network or step through the saved action log (see action_log.py)')
+    parser.add_argument('--tiles', dest='tiles', default=False, action='store_true', help='Draw the tile grid and input region next to the screen')
+    parser.add_argument('--network', dest='network', default=False, action='store_true', help='Draw the network next to the screen. Only with --source network')
+    parser.add_argument('--fps', dest='fps', type=float, default=60.0, help='Frames per second of the emulator')
+    parser.add_argument('--frame-skip', dest='frame_skip', type=int, default=1, help='Only write every Nth frame. Useful for gifs')
+    parser.add_argument('--max-frames', dest='max_frames', type=int, default=None, help='Stop each run after this many frames')
+    parser.add_argument('--queue-size', dest='queue_size', type=int, default=128, help='Frames that can wait for the encoder before emulation waits')
+    parser.add_argument('--processes', dest='processes', type=int, default=1, help='Number of individuals exported at the same time')
+    args = parser.parse_args()
+    if args.network and args.source == 'actions':
+        parser.error('--network needs --source network')
+    return args
+
+
+if __name__ == '__main__':
+    from replay import find_individuals
+
+    args = parse_args()
+    inds = [int(ind) for ind in args.inds.split(',')] if args.inds else None
+    options = {name: getattr(args, name) for name in ('source', 'tiles', 'network', 'fps', 'frame_skip', 'max_frames', 'queue_size')}
+    os.makedirs(args.output, exist_ok=True)
+
+    tasks = []
+    for population_folder in args.populations:
+        for individual_name in find_individuals(population_folder, inds):
+            fname = get_video_filename(args.output, population_folder, individual_name, args.format)
+            tasks.append((population_folder, individual_name, fname, options))
+    if not tasks:
+        raise Exception('No best_ind_gen* folders found')
+
+    with mp.Pool(args.processes, initializer=_init_worker, initargs=(None,)) as pool:
+        for fname, frames in pool.imap_unordered(export_individual, tasks):
+            print(f'Wrote {fname} ({frames} frames)')
+    sys.exit(0)